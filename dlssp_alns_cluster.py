@@ -2,139 +2,339 @@ import pandas as pd
 from datetime import datetime, timedelta
 import random
 import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dlssp_alns_ops import DESTROY, REPAIR, OperatorPortfolio, accept, merge_stats, operator_groups
+import numpy as np
+from dlssp_export import export_schedule, to_records
+from dlssp_io import read_params, read_table
+from dlssp_lanes import assign_lane_indices, lane_layout, lane_positions, lane_speeds
+from dlssp_orders import OrderStore
+from dlssp_sim import simulate
+from dlssp_trays import hashed_slot, place_skus, sku_hash
+import dlssp_trace as trace
+from dlssp_schedule import (ObjectiveEvaluator, ScheduleState, decode_chains, prev_wave_min, to_timedelta64, to_us,
+                            NO_CAP, US_PER_MIN)
+
+PRINT_ROWS = 50
+
+ORDER_SCHEMA = {'OrderID': 'label', 'Wave': 'number', 'ReleaseTime': 'number', 'SKU': 'label', 'Quantity': 'number',
+                'ProcessingTime': 'number', 'PackingTime': 'number', 'Lane': 'label', 'LaneSpeed': 'number'}
 
 def load_params(file_path="params.xlsx"):
-    df = pd.read_excel(file_path)
-    params = {}
-    for _, row in df.iterrows():
-        key = str(row['param']).strip()
-        value = row['value']
-        try:
-            value = float(value)
-        except:
-            pass
-        params[key] = value
-    return params
+    return read_params(file_path)
 
 def compute_travel_time(quantity, lane_speed, lane_pos, sku_pos, distance_factor=1.0):
     distance = abs(lane_pos - sku_pos) * distance_factor
     return timedelta(minutes=quantity * distance / lane_speed)
 
 def compute_induction_time(sku):
-    return timedelta(minutes=1 + (hash(sku) % 3))
+    return timedelta(minutes=1 + (sku_hash(sku) % 3))
 
 def compute_completion_time(start, travel, processing, packing, induction):
     return start + travel + timedelta(minutes=processing) + timedelta(minutes=packing) + induction
 
-def assign_tray(sku, lane, lane_positions):
-    sku_pos = hash(sku) % 30
+def assign_tray(sku, lane, lane_positions, tray_positions=None):
+    # tray slot from a dlssp_trays placement when given, the fixed hash slot otherwise
+    sku_pos = tray_positions[sku] if tray_positions is not None and sku in tray_positions else hashed_slot(sku)
     lane_pos = lane_positions.get(lane, 0)
     return sku_pos, lane_pos
 
-def schedule_orders(orders_df, params, lane_positions):
-    results = []
-    lane_last_end = {}
-    lane_total_time = {}
-    current_time = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
-    orders_sorted = orders_df.sort_values(by='ReleaseTime')
-    active_trays = 0
-    Umax = float(params.get('Umax', 0.85))
+def schedule_orders(orders_df, params, lane_positions, return_sim=False, columnar=False, tray_positions=None):
+    with trace.phase("decode"):
+        data = _order_arrays(orders_df, params, lane_positions, tray_positions)
+        start, completion = decode_chains(data['lane'], data['release'], data['duration'], data['cap'])
+        sim = _simulate(data, params, start)
+    oids = data['df']['OrderID'].tolist()
+    for t_from, t_to, i in sim.gridlock:
+        trace.warn("gridlock", f"potential gridlock at Order {oids[i]} (Ut>{sim.umax}) "
+                   f"from {t_from / US_PER_MIN:.1f} to {t_to / US_PER_MIN:.1f} min", order=oids[i],
+                   t_from=t_from, t_to=t_to)
+    trace.flush_warnings()
+    results = _results(data, params, _origin(), start, completion, columnar)
+    return (results, sim) if return_sim else results
+
+def _simulate(data, params, start, block=False):
+    # Ut of the schedule on the loop: a tray is held from induction until discharge at the lane
+    service = data['duration'] - data['induction'] - data['travel']
+    return simulate(data['lane'], start, data['induction'], data['travel'], service, int(params.get('K', 8)),
+                    float(params.get('Umax', 0.85)), block)
+
+def _order_arrays(orders_df, params, lane_positions, tray_positions=None):
+    if isinstance(orders_df, OrderStore):
+        orders_df = orders_df.to_frame()
+    df = orders_df.sort_values(by='ReleaseTime', kind='stable').reset_index(drop=True)
     theta = float(params.get('theta', 0.3))
+    wave = df['Wave'] if 'Wave' in df else pd.Series(1, index=df.index)
+    processing = df['ProcessingTime'] if 'ProcessingTime' in df else pd.Series(5, index=df.index)
+    packing = df['PackingTime'] if 'PackingTime' in df else pd.Series(5, index=df.index)
+    pairs = df[['SKU', 'Lane']].drop_duplicates()
+    pos = pd.DataFrame([assign_tray(sku, lane, lane_positions, tray_positions)
+                        for sku, lane in zip(pairs['SKU'], pairs['Lane'])], columns=['sku_pos', 'lane_pos'],
+                       index=pairs.index)
+    pos = df[['SKU', 'Lane']].merge(pairs.join(pos), on=['SKU', 'Lane'], how='left')
+    travel = to_us(df['Quantity'] * ((pos['lane_pos'] - pos['sku_pos']).abs() * 1.0) / df['LaneSpeed'])
+    one_us = timedelta(microseconds=1)
+    induction = df['SKU'].map({sku: compute_induction_time(sku) // one_us for sku in df['SKU'].unique()})
+    release = to_us(df['ReleaseTime'])
+    prev = prev_wave_min(wave.to_numpy(), df['ReleaseTime'].to_numpy())
+    cap = np.where(np.isnan(prev), NO_CAP, to_us(np.nan_to_num(prev) * theta))
+    induction = induction.to_numpy(dtype=np.int64)
+    return {
+        'df': df, 'wave': wave.to_numpy(), 'lane': df['Lane'].to_numpy(), 'sku_pos': pos['sku_pos'].to_numpy(),
+        'travel': travel, 'induction': induction, 'release': release, 'cap': cap,
+        'duration': travel + to_us(processing) + to_us(packing) + induction,
+        'sla': release + 120 * US_PER_MIN,
+    }
 
-    for _, row in orders_sorted.iterrows():
-        lane = row['Lane']
-        release = current_time + timedelta(minutes=row['ReleaseTime'])
-        lane_speed = row['LaneSpeed']
-        processing_time = row.get('ProcessingTime', 5)
-        packing_time = row.get('PackingTime', 5)
-        quantity = row['Quantity']
-        sku = row['SKU']
-
-        last_end = lane_last_end.get(lane, release)
-        start_time = max(last_end, release)
-
-        wave = row.get('Wave', 1)
-        if wave > 1:
-            prev_wave_min = orders_sorted[orders_sorted['Wave']==wave-1]['ReleaseTime'].min()
-            if pd.notna(prev_wave_min):
-                overlap_minutes = float(prev_wave_min) * theta
-                start_time = min(start_time, current_time + timedelta(minutes=overlap_minutes))
-
-        sku_pos, lane_pos = assign_tray(sku, lane, lane_positions)
-        travel_time = compute_travel_time(quantity, lane_speed, lane_pos, sku_pos)
-        induction_time = compute_induction_time(sku)
-        completion_time = compute_completion_time(start_time, travel_time, processing_time, packing_time, induction_time)
-
-        lane_last_end[lane] = completion_time
-        lane_total_time[lane] = lane_total_time.get(lane, timedelta(0)) + (completion_time - start_time)
-
-        sla_time = release + timedelta(hours=2)
-        tardiness = max(timedelta(0), completion_time - sla_time)
-
-        active_trays += 1
-        if active_trays / len(orders_sorted) > Umax:
-            print(f"Warning: potential gridlock at Order {row['OrderID']} (Ut>{Umax})")
-
-        results.append({
-            'OrderID': row['OrderID'],
-            'Wave': wave,
-            'Lane': lane,
-            'StartTime': start_time,
-            'CompletionTime': completion_time,
-            'TravelTime': travel_time,
-            'InductionTime': induction_time,
-            'TrayPos': sku_pos,
-            'SLA': sla_time,
-            'Tardiness': tardiness
-        })
-
-    lane_avg_time = sum(lt.total_seconds() for lt in lane_total_time.values()) / len(lane_total_time)
-    for r in results:
-        lane_time = lane_total_time[r['Lane']].total_seconds()
-        beta = float(params.get('beta_l', 0.5))
-        r['LaneImbalance'] = beta * abs(lane_time - lane_avg_time)/60
+def _origin():
+    return datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
 
-    return results
+def _lane_imbalance(data, params):
+    # data['lane_total'] (us of work per lane) overrides the totals of the orders in data, e.g. for a stream
+    lane_total = (pd.Series(data['lane_total']) if 'lane_total' in data
+                  else pd.Series(data['duration']).groupby(data['lane']).sum()) / 1e6
+    beta = float(params.get('beta_l', 0.5))
+    return beta * (lane_total - lane_total.mean()).abs() / 60
 
-def alns_optimize(orders_df, params, lane_positions):
-    best_solution = schedule_orders(orders_df, params, lane_positions)
-    best_score = compute_objective(best_solution, params)
+def _evaluator(data, params):
+    lane_imbalance = float(_lane_imbalance(data, params)[data['lane']].sum())
+    return ObjectiveEvaluator(params, data['release'], data['sla'], lane_imbalance)
 
-    alns_iters = int(params.get('alns_iters', 200))
+def _results(data, params, origin, start, completion, columnar=False):
+    # column arrays (datetime64 / timedelta64 [us]) for dlssp_export; list of dicts otherwise
+    start, completion = np.asarray(start, dtype=np.int64), np.asarray(completion, dtype=np.int64)
+    origin = np.datetime64(origin, 'us')
+    cols = {
+        'OrderID': data['df']['OrderID'].to_numpy(), 'Wave': data['wave'], 'Lane': data['lane'],
+        'StartTime': origin + to_timedelta64(start), 'CompletionTime': origin + to_timedelta64(completion),
+        'TravelTime': to_timedelta64(data['travel']), 'InductionTime': to_timedelta64(data['induction']),
+        'TrayPos': data['sku_pos'], 'SLA': origin + to_timedelta64(data['sla']),
+        'Tardiness': to_timedelta64(np.maximum(completion - data['sla'], 0)),
+        'LaneImbalance': _lane_imbalance(data, params)[data['lane']].to_numpy(),
+    }
+    return cols if columnar else to_records(cols)
+
+def _alns_search(state, evaluator, params, rng, iters, groups, t0=None, deadline=None, resume=None):
+    # Adaptive LNS: roulette-wheel destroy/repair operators (dlssp_alns_ops) with simulated-annealing acceptance.
+    # Only the touched lane suffixes are re-timed and a rejected move is rolled back from the checkpoint.
+    # deadline (perf_counter time) stops the search early, after at least one iteration. The operator portfolio
+    # and temperature come back as `resume`; passing that in continues the adaptation and cooling of a search.
     destroy_min = int(params.get('alns_destroy_k_min', 2))
     destroy_max = int(params.get('alns_destroy_k_max', 4))
+    window = int(params.get('alns_insert_window', 5))
+    cooling = float(params.get('alns_cooling', 0.995))
+    if resume is None:
+        ops = OperatorPortfolio(decay=float(params.get('alns_decay', 0.8)))
+        # start where worsening the makespan by one average order is accepted with probability 1/e
+        mean_duration = sum(state.duration) / max(len(state.duration), 1) / US_PER_MIN
+        temperature = float(params.get('alns_t0', evaluator.lambda3 * mean_duration))
+    else:
+        ops, temperature = resume['ops'], resume['temperature']
+
+    def insert_cost(extra_tardiness, latest):
+        return evaluator.insertion_cost(extra_tardiness, latest, state.cmax())
+
+    t0 = time.perf_counter() if t0 is None else t0
+    current = best_score = evaluator.score(state)
+    best_seq = [i for seq in state.sequence().values() for i in seq]
+    curve = []
+    done = 0
+    for it in range(iters):
+        if it and deadline is not None and time.perf_counter() >= deadline:
+            break
+        with trace.phase("alns.iteration", event=False):
+            k = rng.randint(destroy_min, destroy_max)
+            d_op, r_op = ops.select('destroy', rng), ops.select('repair', rng)
+            state.checkpoint()
+            removed = ops.run(d_op, DESTROY[d_op[1]], state, groups, rng, k)
+            state.remove(removed)
+            ops.run(r_op, REPAIR[r_op[1]], state, removed, rng, insert_cost, window)
+            score = evaluator.score(state)
+            if score < best_score:
+                outcome = 'best'
+            elif score < current:
+                outcome = 'improved'
+            elif score == current:
+                outcome = 'unchanged'
+            elif accept(score - current, temperature, rng):
+                outcome = 'accepted'
+            else:
+                outcome = 'rejected'
+            if outcome == 'rejected':
+                state.rollback()
+            else:
+                state.commit()
+                current = score
+            if outcome == 'best':
+                best_score = score
+                best_seq = [i for seq in state.sequence().values() for i in seq]
+            ops.update((d_op, r_op), outcome)
+            temperature *= cooling
+            curve.append((time.perf_counter() - t0, best_score))
+        done = it + 1
+        trace.progress("alns", iteration=it + 1, iters=iters, best=best_score, current=current)
+    stats = {f"{kind}:{name}": dict(s, weight=ops.weights[(kind, name)]) for (kind, name), s in ops.stats.items()}
+    if trace.enabled():
+        trace.count("alns.iterations", done)
+        for op, s in stats.items():
+            trace.count(f"alns.{op}.calls", s['calls'])
+    return best_score, best_seq, curve, stats, {'ops': ops, 'temperature': temperature}
+
+def _alns_seed(params, seed):
+    if seed is None and params.get('seed') is not None:
+        seed = params['seed']
+    return None if seed is None else int(seed)
+
+def alns_optimize(orders_df, params, lane_positions, seed=None, return_stats=False, columnar=False,
+                  tray_positions=None):
+    data = _order_arrays(orders_df, params, lane_positions, tray_positions)
+    origin = _origin()
+    state = ScheduleState(data['lane'], data['release'], data['duration'], data['cap'], data['sla'])
+    rng = random.Random(_alns_seed(params, seed))
+    groups = operator_groups(data['wave'], data['df']['SKU'])
+    with trace.phase("alns"):
+        _, best_seq, _, stats, _ = _alns_search(state, _evaluator(data, params), params, rng,
+                                             int(params.get('alns_iters', 200)), groups)
+    start, completion = decode_chains(data['lane'], data['release'], data['duration'], data['cap'], best_seq)
+    results = _results(data, params, origin, start, completion, columnar)
+    return (results, stats) if return_stats else results
+
+_WORKER = {}
+
+def _alns_worker_init(lane, release, duration, cap, sla, wave, sku, params, lane_imbalance):
+    # runs once per worker process: the order arrays are shipped here instead of with every task
+    _WORKER.update(arrays=(lane, release, duration, cap, sla), groups=operator_groups(wave, sku), params=params,
+                   lane_imbalance=lane_imbalance)
+
+def _alns_worker(seed, sequence, iters, t0, resume):
+    # nothing a task builds outlives it, so its result only depends on its arguments, not on the tasks the pool
+    # happened to run in this process before
+    lane, release, duration, cap, sla = _WORKER['arrays']
+    state = ScheduleState(lane, release, duration, cap, sla, sequence=sequence)
+    evaluator = ObjectiveEvaluator(_WORKER['params'], release, sla, _WORKER['lane_imbalance'])
+    return _alns_search(state, evaluator, _WORKER['params'], random.Random(seed), iters, _WORKER['groups'], t0,
+                        resume=resume)
+
+def alns_optimize_parallel(orders_df, params, lane_positions, workers=None, seed=None, sync_every=None,
+                           return_stats=False, columnar=False, tray_positions=None):
+    # N seeded trajectories in a process pool. Every sync_every iterations all workers restart from the best
+    # incumbent found so far, each keeping its own operator weights and temperature; worker seeds derive from the
+    # master seed, so the result is reproducible.
+    data = _order_arrays(orders_df, params, lane_positions, tray_positions)
+    origin = _origin()
+    evaluator = _evaluator(data, params)
+    workers = int(workers or params.get('alns_workers', 0) or os.cpu_count() or 1)
+    alns_iters = int(params.get('alns_iters', 200))
+    sync_every = max(1, int(sync_every or params.get('alns_sync_every', 50)))
+    master = _alns_seed(params, seed)
+    master = 0 if master is None else master
+    arrays = (data['lane'], data['release'], data['duration'], data['cap'], data['sla'])
+    incumbent = ScheduleState(*arrays)
+    best_seq = [i for seq in incumbent.sequence().values() for i in seq]
+    best_score = evaluator.score(incumbent)
+    curves = [[] for _ in range(workers)]
+    resume, stats = [None] * workers, []
+    t0 = time.perf_counter()
+    initargs = arrays + (data['wave'], data['df']['SKU'].to_numpy(), params, evaluator.lane_imbalance)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_alns_worker_init, initargs=initargs) as pool:
+        done, epoch = 0, 0
+        while done < alns_iters:
+            iters = min(sync_every, alns_iters - done)
+            futures = [pool.submit(_alns_worker, f"{master}-{w}-{epoch}", best_seq, iters, t0, resume[w])
+                       for w in range(workers)]
+            stats = []
+            for w, fut in enumerate(futures):
+                score, seq, curve, worker_stats, resume[w] = fut.result()
+                # a worker's stats are cumulative over its epochs, so the last ones are its totals
+                stats.append(worker_stats)
+                curves[w].extend((done + k + 1, elapsed, s) for k, (elapsed, s) in enumerate(curve))
+                if score < best_score:
+                    best_score, best_seq = score, seq
+            done += iters
+            epoch += 1
+    start, completion = decode_chains(data['lane'], data['release'], data['duration'], data['cap'], best_seq)
+    results = _results(data, params, origin, start, completion, columnar)
+    return (results, curves, merge_stats(stats)) if return_stats else (results, curves)
+
+def compute_objective(results, params, return_components=False):
+    # one conversion to integer microsecond arrays, then the shared ObjectiveEvaluator; results may be columnar
+    if isinstance(results, dict):
+        completion, sla = (np.asarray(results[k], dtype='datetime64[us]') for k in ('CompletionTime', 'SLA'))
+        lane_imbalance = float(np.sum(results['LaneImbalance']))
+    else:
+        completion = np.array([r['CompletionTime'] for r in results], dtype='datetime64[us]')
+        sla = np.array([r['SLA'] for r in results], dtype='datetime64[us]')
+        lane_imbalance = float(np.sum([r['LaneImbalance'] for r in results]))
+    ref = sla.min()
+    completion, sla = (completion - ref).astype(np.int64), (sla - ref).astype(np.int64)
+    total, components = ObjectiveEvaluator(params, sla - 120 * US_PER_MIN, sla, lane_imbalance).evaluate(completion)
+    return (total, components) if return_components else total
+
+def assign_order_lanes(orders_df, params, layout, tray_positions=None):
+    # (re)assign the Lane column with dlssp_lanes; lane_mode in params picks greedy / lpt / travel
+    df = orders_df.sort_values(by='ReleaseTime', kind='stable').reset_index(drop=True)
+    work = sum(df[c] if c in df else 5 for c in ('ProcessingTime', 'PackingTime'))
+    sku_pos = df['SKU'].map({sku: assign_tray(sku, None, {}, tray_positions)[0] for sku in df['SKU'].unique()})
+    idx = assign_lane_indices(np.broadcast_to(work, len(df)), layout, str(params.get('lane_mode', 'greedy')),
+                              quantity=df['Quantity'], sku_pos=sku_pos)
+    df['Lane'] = np.asarray(layout.ids)[idx]
+    return df
+
+def place_trays(orders_df, params, layout, partition=None):
+    # dlssp_trays placement from the orders' lanes; tray_mode 'hash' keeps the fixed hash slots (None), as do orders
+    # on lanes the layout does not know, since placement prices travel from every lane's position
+    if str(params.get('tray_mode', 'placed')) == 'hash':
+        return None
+    unknown = set(orders_df['Lane'].unique().tolist()) - set(layout.ids)
+    if unknown:
+        trace.warn("trays", f"lanes {sorted(unknown, key=str)[:5]} are not in the lane layout; "
+                            "keeping the hash tray slots.", lanes=len(unknown))
+        return None
+    with trace.phase("trays"):
+        placement = place_skus(orders_df, layout, partition, n_slots=int(params.get('tray_slots', 30)),
+                               spacing=float(params.get('tray_spacing', 1.0)),
+                               cluster_weight=float(params.get('tray_cluster_weight', 0.1)))
+        trace.count("tray_moves", placement.moves)
+    return placement.positions
+
+def prepare_orders(orders_df, params, layout, partition=None, tray_positions=None):
+    # lanes (when missing or lane_mode is set), LaneSpeed and tray positions, as every ALNS entry point needs them;
+    # given tray_positions are kept, else the trays are placed (None for tray_mode 'hash')
+    speed = lane_speeds(layout)
+    place = tray_positions is None
+    if 'Lane' not in orders_df or 'lane_mode' in params:
+        with trace.phase("lanes"):
+            orders_df = assign_order_lanes(orders_df, params, layout, tray_positions)
+        if place and str(params.get('lane_mode', 'greedy')) == 'travel':
+            # lanes were chosen against the hash slots: place the trays, re-pick lanes for the new slots, place again
+            lane_speed = orders_df.get('LaneSpeed', orders_df['Lane'].map(speed))
+            tray_positions = place_trays(orders_df.assign(LaneSpeed=lane_speed), params, layout, partition)
+            if tray_positions is not None:
+                with trace.phase("lanes"):
+                    orders_df = assign_order_lanes(orders_df, params, layout, tray_positions)
+    if 'LaneSpeed' not in orders_df:
+        orders_df['LaneSpeed'] = orders_df['Lane'].map(speed)
+    if place:
+        tray_positions = place_trays(orders_df, params, layout, partition)
+    return orders_df, tray_positions
 
-    for _ in range(alns_iters):
-        temp_df = orders_df.copy()
-        remove_n = random.randint(destroy_min, destroy_max)
-        remove_idx = random.sample(list(temp_df.index), min(remove_n, len(temp_df)))
-        temp_df = temp_df.drop(remove_idx)
-
-        temp_df = temp_df.sample(frac=1)
-        temp_solution = schedule_orders(temp_df, params, lane_positions)
-        score = compute_objective(temp_solution, params)
-        if score < best_score:
-            best_solution = temp_solution
-            best_score = score
-
-    return best_solution
-
-def compute_objective(results, params):
-    lambda1 = float(params.get('lambda1', 1e6))
-    lambda2 = float(params.get('lambda2', 1000))
-    lambda3 = float(params.get('lambda3', 1))
-    Cmax = max(r['CompletionTime'] for r in results)
-    lane_imbalance = sum(r['LaneImbalance'] for r in results)
-    sla_penalty = sum(max(timedelta(0), r['CompletionTime'] - r['SLA']).total_seconds()/60 for r in results)
-    tardiness_penalty = sum(r['Tardiness'].total_seconds()/60 for r in results)
-    total_score = lambda3*Cmax.timestamp() + lambda2*lane_imbalance + lambda1*sla_penalty + tardiness_penalty
-    return total_score
-
-def run_pipeline(orders_file="orders.xlsx", params_file="params.xlsx"):
-    orders_df = pd.read_excel(orders_file)
-    params = load_params(params_file)
-    lane_positions = {1:0, 2:10, 3:20}
-    results = alns_optimize(orders_df, params, lane_positions)
+def run_pipeline(orders_file="orders.xlsx", params_file="params.xlsx", lanes_file=None, columnar=False,
+                 partition=None):
+    # partition: order -> cluster (e.g. dlssp_pipeline's part_final), keeps a cluster's SKUs on neighbouring trays
+    with trace.phase("load"):
+        orders_df = read_table(orders_file, ORDER_SCHEMA, optional=('Wave', 'ProcessingTime', 'PackingTime', 'Lane',
+                                                                    'LaneSpeed'))
+        params = load_params(params_file)
+        layout = lane_layout(params, lanes_file)
+    positions = lane_positions(layout)
+    orders_df, tray_positions = prepare_orders(orders_df, params, layout, partition)
+    if int(params.get('alns_workers', 1)) > 1:
+        results, _ = alns_optimize_parallel(orders_df, params, positions, columnar=columnar,
+                                            tray_positions=tray_positions)
+    else:
+        results = alns_optimize(orders_df, params, positions, columnar=columnar, tray_positions=tray_positions)
     return results
 
 if __name__ == "__main__":
@@ -142,15 +342,14 @@ if __name__ == "__main__":
     params_file = "params.xlsx"
     print(f"Reading orders from {orders_file} ...")
     try:
-        results = run_pipeline(orders_file, params_file)
+        results = run_pipeline(orders_file, params_file, columnar=True)
         print("=== DLSSP ALNS + Tray Clustering Simulation Results ===")
-        for r in results:
+        for r in to_records({k: v[:PRINT_ROWS] for k, v in results.items()}):
             print(f"Order {r['OrderID']} | Wave {r['Wave']} | Lane {r['Lane']} | "
                   f"Start {r['StartTime']} | Completion {r['CompletionTime']} | "
                   f"Travel {r['TravelTime']} | Induction {r['InductionTime']} | "
                   f"Tardiness {r['Tardiness']} | LaneImbalance {r['LaneImbalance']:.2f}")
-        df_results = pd.DataFrame(results)
-        df_results.to_excel("results_alns_cluster.xlsx", index=False)
-        print(f"\nResults saved to results_alns_cluster.xlsx")
+        paths = export_schedule(results, "results_alns_cluster", excel="results_alns_cluster.xlsx")
+        print(f"\nResults saved to {paths['Schedule']} (summary: {paths['excel']})")
     except FileNotFoundError as e:
         print(f"ERROR: {e}")
@@ -0,0 +1,128 @@
+import heapq
+import math
+import time
+from collections import defaultdict
+
+# Destroy operators pick k orders to pull out of their lane chains; repair operators put them back.
+# Both work on a dlssp_schedule.ScheduleState and only touch the lanes of the orders involved.
+
+def random_removal(state, groups, rng, k):
+    n = len(state.lane)
+    return rng.sample(range(n), min(k, n))
+
+def worst_removal(state, groups, rng, k):
+    # most tardy orders first, then the ones that wait longest after release
+    n = len(state.lane)
+    pool = heapq.nlargest(min(n, 3 * k), range(n),
+                          key=lambda i: (state.tardiness[i], state.completion[i] - state.release[i]))
+    return rng.sample(pool, min(k, len(pool)))
+
+def lane_removal(state, groups, rng, k):
+    seq = state.lanes[rng.choice([l for l, seq in state.lanes.items() if seq])]
+    p = rng.randint(0, max(0, len(seq) - k))
+    return seq[p:p + k]
+
+def _related_removal(members, key, state, rng, k):
+    n = len(state.lane)
+    group = members[key[rng.randrange(n)]]
+    picked = rng.sample(group, min(k, len(group)))
+    while len(picked) < min(k, n):
+        i = rng.randrange(n)
+        if i not in picked: picked.append(i)
+    return picked
+
+def wave_removal(state, groups, rng, k):
+    return _related_removal(groups['wave'], groups['wave_of'], state, rng, k)
+
+def sku_removal(state, groups, rng, k):
+    return _related_removal(groups['sku'], groups['sku_of'], state, rng, k)
+
+def _positions(state, i, rng, window):
+    # insertion slots around the order's release rank in its lane, both lane ends and a few random far slots
+    seq = state.lanes[state.lane[i]]
+    r = state.release[i]
+    p0 = sum(1 for j in seq if state.release[j] <= r)
+    slots = set(range(max(0, p0 - window), min(len(seq), p0 + window) + 1)) | {0, len(seq)}
+    slots.update(rng.randint(0, len(seq)) for _ in range(window))
+    return sorted(slots)
+
+def _insertion_costs(state, i, rng, cost, window):
+    return sorted((cost(*state.insertion_delta(i, p)), p) for p in _positions(state, i, rng, window))
+
+def random_repair(state, removed, rng, cost, window):
+    for i in removed:
+        state.insert(i, rng.randint(0, state.lane_length(i)))
+
+def greedy_repair(state, removed, rng, cost, window):
+    for i in rng.sample(removed, len(removed)):
+        state.insert(i, _insertion_costs(state, i, rng, cost, window)[0][1])
+
+def regret_repair(state, removed, rng, cost, window, k=2):
+    # insert the order that loses most by not getting its best slot: regret = sum of (k-th best - best)
+    pending = list(removed)
+    while pending:
+        best = None
+        for i in pending:
+            costs = _insertion_costs(state, i, rng, cost, window)
+            regret = sum(costs[min(j, len(costs) - 1)][0] - costs[0][0] for j in range(1, k))
+            key = (-regret, costs[0][0], i)
+            if best is None or key < best[0]:
+                best = (key, i, costs[0][1])
+        _, i, p = best
+        state.insert(i, p)
+        pending.remove(i)
+
+DESTROY = {'random': random_removal, 'worst': worst_removal, 'lane': lane_removal,
+           'wave': wave_removal, 'sku': sku_removal}
+REPAIR = {'random': random_repair, 'greedy': greedy_repair, 'regret': regret_repair}
+
+def operator_groups(wave, sku):
+    groups = {'wave_of': list(wave), 'sku_of': list(sku), 'wave': defaultdict(list), 'sku': defaultdict(list)}
+    for i, (w, s) in enumerate(zip(groups['wave_of'], groups['sku_of'])):
+        groups['wave'][w].append(i)
+        groups['sku'][s].append(i)
+    return groups
+
+class OperatorPortfolio:
+    # Roulette-wheel selection; after each iteration an operator's weight decays towards the score of the outcome:
+    # new global best, improved current, accepted worse (simulated annealing), unchanged or rejected.
+    def __init__(self, decay=0.8, scores=(33.0, 9.0, 13.0, 0.0, 0.0)):
+        self.decay = decay
+        self.scores = dict(zip(('best', 'improved', 'accepted', 'unchanged', 'rejected'), scores))
+        self.weights = {('destroy', name): 1.0 for name in DESTROY}
+        self.weights.update({('repair', name): 1.0 for name in REPAIR})
+        self.stats = {op: {'calls': 0, 'time': 0.0, **dict.fromkeys(self.scores, 0)}
+                      for op in self.weights}
+
+    def select(self, kind, rng):
+        ops = [op for op in self.weights if op[0] == kind]
+        return rng.choices(ops, weights=[self.weights[op] for op in ops])[0]
+
+    def run(self, op, fn, *args):
+        t = time.perf_counter()
+        out = fn(*args)
+        self.stats[op]['calls'] += 1
+        self.stats[op]['time'] += time.perf_counter() - t
+        return out
+
+    def update(self, ops, outcome):
+        for op in ops:
+            self.stats[op][outcome] += 1
+            self.weights[op] = self.decay * self.weights[op] + (1 - self.decay) * self.scores[outcome]
+            self.weights[op] = max(self.weights[op], 0.1)
+
+def accept(delta, temperature, rng):
+    return delta <= 0 or (temperature > 0 and rng.random() < math.exp(-delta / temperature))
+
+def merge_stats(stats_list):
+    # calls, time and outcome counts add up; an operator's weight is the mean over the searches
+    merged = {}
+    for stats in stats_list:
+        for op, s in stats.items():
+            m = merged.setdefault(op, dict.fromkeys(s, 0))
+            for key, v in s.items():
+                m[key] += v
+    for m in merged.values():
+        if 'weight' in m:
+            m['weight'] /= len(stats_list)
+    return merged
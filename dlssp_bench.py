@@ -0,0 +1,258 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import dlssp_alns_cluster as alns
+import dlssp_pipeline as louvain
+import dlssp_pipeline_optimized as optimized
+import dlssp_trays as trays
+import dlssp_online as online
+import run_dlssp
+from dlssp_graph import CSRGraph, order_edges
+from dlssp_io import incidence_from_pairs
+from dlssp_lanes import LaneLayout, assign_lane_indices, lane_positions
+from dlssp_orders import OrderStore
+
+# Seeded synthetic DLSSP instances and a timing harness. SKU popularity is Zipf-like (the SKU of rank r is drawn
+# with probability ~ r^-skew), order sizes are 1 + Poisson, waves are consecutive release windows. Every stage
+# is timed on its own (best of `repeat` untraced runs) and, with memory=True, re-run once under tracemalloc for
+# its peak allocation. Graph and ALNS stages are quadratic-ish in the hot SKUs / iterations, so each stage has an
+# order-count limit above which it is skipped rather than left to run for hours.
+
+Instance = namedtuple("Instance", ["orders", "lines", "layout", "params", "seed"])
+
+WAVE_GAP = 30          # minutes between wave releases
+ONLINE_EVERY = 5       # minutes between online replans
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+STAGE_LIMITS = {'build_order_graph': 20_000, 'graph': 50_000, 'louvain_p1': 50_000, 'louvain_p2': 50_000,
+                'leiden_p2': 50_000, 'sweep': 20_000, 'refine': 20_000, 'schedule_orders': None, 'trays': None,
+                'decode': None, 'alns': 100_000, 'online': 20_000}
+SWEEP_GAMMAS = tuple(round(0.2 + 0.1 * i, 2) for i in range(20))    # 0.2 .. 2.1
+BENCH_PARAMS = {'K': 8, 'Umax': 0.85, 'theta': 0.3, 'lambda1': 1e6, 'lambda2': 1000, 'lambda3': 1, 'beta_l': 0.5,
+                'alns_iters': 200, 'alns_destroy_k_min': 2, 'alns_destroy_k_max': 4}
+
+def generate_instance(n_orders, n_skus=None, n_waves=None, n_lanes=8, skew=0.8, mean_lines=3.0, seed=0):
+    rng = np.random.default_rng(seed)
+    n_skus = n_skus or max(50, n_orders // 2)
+    n_waves = n_waves or max(1, n_orders // 500)
+    p = np.arange(1, n_skus + 1, dtype=np.float64) ** -skew
+    lines = 1 + rng.poisson(mean_lines - 1, n_orders)
+    order = np.repeat(np.arange(n_orders, dtype=np.int64), lines)
+    sku = rng.choice(n_skus, size=len(order), p=p / p.sum())
+    # one line per (order, SKU); the SKU code is the popularity rank, so an order's first line is its hottest SKU
+    pairs = np.unique(order * n_skus + sku)
+    order, sku = pairs // n_skus, pairs % n_skus
+    first = np.unique(order, return_index=True)[1]
+    oid = np.array([f"O{i:07d}" for i in range(n_orders)], dtype=object)
+    sid = np.array([f"S{i:06d}" for i in range(n_skus)], dtype=object)
+    wave = np.sort(rng.integers(1, n_waves + 1, n_orders))
+    release = (wave - 1) * WAVE_GAP + rng.integers(0, WAVE_GAP // 2, n_orders)
+    layout = LaneLayout(list(range(1, n_lanes + 1)), np.arange(n_lanes) * 10.0, rng.choice([0.8, 1.0, 1.2], n_lanes))
+    processing, packing = rng.integers(1, 6, n_orders), rng.integers(1, 6, n_orders)
+    lane = np.asarray(layout.ids)[assign_lane_indices(processing + packing, layout)]
+    orders = pd.DataFrame({'OrderID': oid, 'Wave': wave, 'ReleaseTime': release, 'SKU': sid[sku[first]],
+                           'Quantity': rng.integers(1, 13, n_orders), 'ProcessingTime': processing,
+                           'PackingTime': packing, 'Lane': lane, 'LaneSpeed': layout.speed[lane - 1]})
+    return Instance(orders, pd.DataFrame({'OrderID': oid[order], 'SKU': sid[sku]}), layout,
+                    {**BENCH_PARAMS, 'n_lanes': n_lanes, 'seed': seed}, seed)
+
+def save_instance(inst, directory, fmt="csv"):
+    # orders / long incidence / lanes / params, readable by the dlssp_io loaders
+    os.makedirs(directory, exist_ok=True)
+    tables = {'orders': inst.orders, 'incidence': inst.lines,
+              'lanes': pd.DataFrame({'lane_id': inst.layout.ids, 'l_pos': inst.layout.pos, 'speed': inst.layout.speed}),
+              'params': pd.DataFrame({'param': list(inst.params), 'value': list(inst.params.values())})}
+    paths = {}
+    for name, df in tables.items():
+        paths[name] = os.path.join(directory, f"{name}.{fmt}")
+        if fmt == "csv":
+            df.to_csv(paths[name], index=False)
+        elif fmt == "parquet":
+            df.to_parquet(paths[name], index=False)
+        else:
+            raise ValueError("fmt must be 'csv' or 'parquet'.")
+    return paths
+
+def _modularity(ctx, part):
+    return louvain._modularity_gamma(ctx['G'], part)
+
+def _stage_build_order_graph(inst, ctx):
+    G = louvain.build_order_graph(ctx['M'])
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges()}
+
+def _stage_graph(inst, ctx):
+    G = ctx['G'] = CSRGraph.from_edges(*order_edges(ctx['M']))
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges()}
+
+def _stage_louvain_p1(inst, ctx):
+    part = ctx['p1'] = louvain.louvain_phase1_verbose(ctx['G'], ctx['M'])
+    return {'communities': len(set(part.values())), 'modularity': _modularity(ctx, part)}
+
+def _stage_louvain_p2(inst, ctx):
+    part = ctx['p2'] = louvain.louvain_phase2_verbose(ctx['G'], ctx['p1'])
+    return {'communities': len(set(part.values())), 'modularity': _modularity(ctx, part)}
+
+def _stage_leiden_p2(inst, ctx):
+    part = louvain.leiden_phase2(ctx['G'], ctx['p1'])
+    return {'communities': len(set(part.values())), 'modularity': _modularity(ctx, part)}
+
+def _stage_sweep(inst, ctx):
+    # SWEEP_GAMMAS with warm starts; quality is the mean modularity over the sweep (each at its own gamma)
+    rows = louvain.resolution_sweep(ctx['G'], SWEEP_GAMMAS)
+    return {'gammas': len(rows), 'mean_modularity': float(np.mean([r['modularity'] for r in rows])),
+            'clusters_min': min(r['clusters'] for r in rows), 'clusters_max': max(r['clusters'] for r in rows)}
+
+def _stage_refine(inst, ctx):
+    part, mod, moves = louvain.improve_with_lexi_tiebreak(ctx['G'], ctx['M'], ctx['p2'])
+    return {'communities': len(set(part.values())), 'modularity': mod, 'moves': moves}
+
+def _stage_schedule_orders(inst, ctx):
+    store = OrderStore.from_frame(inst.orders)
+    optimized.schedule_orders(store, max_utilization=inst.params['Umax'], trays=int(inst.params['K']))
+    d = store.data
+    return {'tardiness': float(d['tardiness'].sum()), 'sla_violations': int(d['sla_violation'].sum()),
+            'makespan': float(d['completion_time'].max())}
+
+def _stage_trays(inst, ctx):
+    placement = trays.place_skus(inst.orders, inst.layout, lines=inst.lines)
+    return {'skus': len(placement.skus), 'travel': placement.cost, 'greedy_travel': placement.initial_cost,
+            'hash_travel': trays.hashed_cost(inst.orders, inst.layout), 'moves': placement.moves}
+
+def _stage_decode(inst, ctx):
+    results = run_dlssp.decode(inst.orders)
+    # decode reports lane imbalance as a timedelta; the ALNS objective takes it in minutes
+    for r in results:
+        r['LaneImbalance'] = r['LaneImbalance'].total_seconds() / 60
+    return {'objective': alns.compute_objective(results, inst.params)}
+
+def _stage_alns(inst, ctx):
+    results = alns.alns_optimize(inst.orders, inst.params, lane_positions(inst.layout), seed=inst.seed)
+    return {'objective': alns.compute_objective(results, inst.params)}
+
+def _stage_online(inst, ctx):
+    # every order known up front, replanned every ONLINE_EVERY minutes: with nothing new a replan may only freeze,
+    # so no open order's start or completion may move
+    scheduler = online.OnlineScheduler(inst.params, lane_positions(inst.layout), seed=inst.seed, columnar=True)
+    scheduler.add_orders(inst.orders)
+    now = float(inst.orders['ReleaseTime'].min())
+    cycle = scheduler.replan(now)
+    chunks, wall, most, cycles = [cycle.frozen], cycle.wall_s, len(scheduler), 1
+    while len(scheduler):
+        before = scheduler.open.set_index('arrival')[['start', 'completion']]
+        now += ONLINE_EVERY
+        cycle = scheduler.replan(now)
+        after = scheduler.open.set_index('arrival')[['start', 'completion']]
+        if not after.equals(before.loc[after.index]):
+            raise RuntimeError(f"replan({now}) without new orders moved open orders.")
+        chunks.append(cycle.frozen)
+        wall, cycles = max(wall, cycle.wall_s), cycles + 1
+    results = online._concat(chunks, True)
+    return {'tardiness_h': float(results['Tardiness'].sum() / np.timedelta64(1, 'h')), 'cycles': cycles,
+            'max_replan_s': wall, 'max_open': most}
+
+STAGES = {name[len('_stage_'):]: fn for name, fn in globals().items() if name.startswith('_stage_')}
+# ctx entries a stage reads, and the stage that fills them
+NEEDS = {'louvain_p1': ('G', 'graph'), 'louvain_p2': ('p1', 'louvain_p1'), 'leiden_p2': ('p1', 'louvain_p1'),
+         'sweep': ('G', 'graph'), 'refine': ('p2', 'louvain_p2')}
+
+def _measure(fn, inst, ctx, repeat, memory):
+    # the stages' [INFO] lines and rate-limited warnings go to stdout; printing is not part of what is measured
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        wall = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            metrics = fn(inst, ctx)
+            wall.append(time.perf_counter() - t0)
+        peak = None
+        if memory:
+            tracemalloc.start()
+            try:
+                fn(inst, dict(ctx))
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            finally:
+                tracemalloc.stop()
+    return min(wall), peak, metrics
+
+def _version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmark(sizes=SIZES, stages=None, seed=0, repeat=1, memory=True, limits=None, out=None, **gen):
+    limits = {**STAGE_LIMITS, **(limits or {})}
+    stages = list(stages or STAGES)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"unknown stages {sorted(unknown)}; choose from {list(STAGES)}.")
+    report = {'version': _version(), 'created': datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+              'seed': seed, 'generator': gen, 'results': []}
+    for n in sizes:
+        t0 = time.perf_counter()
+        inst = generate_instance(n, seed=seed, **gen)
+        ctx = {}
+        print(f"[BENCH] n={n}: {len(inst.lines)} lines, {inst.lines['SKU'].nunique()} SKUs, "
+              f"generated in {time.perf_counter() - t0:.2f}s")
+        for name in stages:
+            row = {'n_orders': n, 'stage': name}
+            key, need = NEEDS.get(name, (None, None))
+            if limits.get(name) is not None and n > limits[name]:
+                row['skipped'] = f"n_orders > {limits[name]}"
+            elif key and key not in ctx:
+                row['skipped'] = f"needs {need}"
+            else:
+                if 'M' not in ctx and name in ('build_order_graph', 'graph', 'louvain_p1', 'refine'):
+                    ctx['M'] = incidence_from_pairs(inst.lines['OrderID'], inst.lines['SKU'])
+                wall, peak, metrics = _measure(STAGES[name], inst, ctx, repeat, memory)
+                row.update(wall_s=wall, peak_mb=peak, **metrics)
+            report['results'].append(row)
+            print(f"[BENCH]   {name:<18} " + (row['skipped'] if 'skipped' in row else
+                  f"{row['wall_s']:9.3f}s" + (f" {row['peak_mb']:9.1f} MB" if row['peak_mb'] is not None else "")))
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2, default=float)
+    return report
+
+def compare(old, new, tolerance=0.10):
+    # rows of `new` that got slower / bigger by more than `tolerance`, or whose quality metrics changed
+    old, new = ({(r['n_orders'], r['stage']): r for r in rep['results'] if 'skipped' not in r}
+                for rep in (old, new))
+    out = []
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        for k in sorted(a.keys() & b.keys() - {'n_orders', 'stage'}):
+            if a[k] is None or b[k] is None or a[k] == b[k]: continue
+            rel = (b[k] - a[k]) / abs(a[k]) if a[k] else float('inf')
+            if k in ('wall_s', 'peak_mb') and rel <= tolerance: continue
+            out.append({'n_orders': key[0], 'stage': key[1], 'metric': k, 'old': a[k], 'new': b[k], 'change': rel})
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="DLSSP scaling benchmark on seeded synthetic instances")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    ap.add_argument("--stages", nargs="+", choices=list(STAGES))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--skew", type=float, default=0.8)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc re-run")
+    ap.add_argument("--out", default=f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    ap.add_argument("--compare", help="earlier JSON report to diff against")
+    args = ap.parse_args()
+    report = run_benchmark(args.sizes, args.stages, args.seed, args.repeat, not args.no_memory, out=args.out,
+                           skew=args.skew)
+    print(f"[BENCH] report written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            for d in compare(json.load(f), report):
+                print(f"[BENCH] n={d['n_orders']} {d['stage']} {d['metric']}: {d['old']:.6g} -> {d['new']:.6g} "
+                      f"({d['change']:+.1%})")
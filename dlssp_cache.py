@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from dlssp_graph import CSRGraph, incidence_matrix
+
+# On-disk cache of built order graphs and Louvain partitions. Every entry is a directory of .npy arrays (opened
+# memory-mapped on a hit) plus a small meta.json; the directory name is a hash of the inputs that determine it.
+# Entry mtimes record last use, and the oldest entries are evicted once the cache grows past max_bytes.
+
+def incidence_hash(M):
+    B = incidence_matrix(M)
+    B.sort_indices()
+    h = hashlib.sha256()
+    h.update(json.dumps([list(M.index), list(M.columns)], default=str).encode())
+    for a in (B.indptr, B.indices):
+        h.update(np.ascontiguousarray(a, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+def _json_default(x):
+    return x.item() if isinstance(x, np.generic) else str(x)
+
+class GraphCache:
+    def __init__(self, root=".dlssp_cache", max_bytes=1 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in meta["arrays"]}
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta, arrays
+
+    def _store(self, key, meta, arrays):
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        for name, a in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), np.asarray(a))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({**meta, "arrays": list(arrays)}, f, default=_json_default)
+        try:
+            os.replace(tmp, self._path(key))
+        except OSError:
+            # another run stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            size = sum(e.stat().st_size for e in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def get_graph(self, key):
+        hit = self._load(key)
+        if hit is None:
+            return None
+        meta, a = hit
+        return CSRGraph(meta["nodes"], a["indptr"], a["indices"], a["weights"])
+
+    def put_graph(self, key, G):
+        self._store(key, {"nodes": G.nodes}, {"indptr": G.indptr, "indices": G.indices, "weights": G.weights})
+
+    def get_partition(self, key, nodes):
+        # partitions are stored against the graph's node list, in the dict's own insertion order
+        hit = self._load(key)
+        if hit is None:
+            return None
+        meta, a = hit
+        part = {nodes[i]: c for i, c in zip(a["order"].tolist(), a["labels"].tolist())}
+        return part, meta.get("info", {})
+
+    def put_partition(self, key, nodes, part, **info):
+        index = {n: i for i, n in enumerate(nodes)}
+        self._store(key, {"info": info}, {"order": np.fromiter((index[n] for n in part), np.int64, len(part)),
+                                          "labels": np.fromiter(part.values(), np.int64, len(part))})
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from dlssp_io import CHUNK_ROWS, file_format
+
+# Bulk result export. Tables are dicts of equal-length column arrays (the schedulers' columnar output) or
+# DataFrames, written to Parquet / Arrow IPC / CSV in CHUNK_ROWS slices: each slice is a view of the columns, so
+# only one chunk is ever converted at a time. Excel is a summary view only: the first max_rows rows per sheet plus
+# an Info sheet with the full row counts and where the complete tables went.
+
+EXCEL_ROWS = 10_000
+
+def default_format():
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'csv'
+
+def _columns(table):
+    if isinstance(table, pd.DataFrame):
+        return {c: table[c].to_numpy() for c in table.columns}
+    if isinstance(table, list):
+        return records_to_columns(table)
+    return table
+
+def _num_rows(columns):
+    return len(next(iter(columns.values()))) if columns else 0
+
+def iter_chunks(columns, chunk_rows=CHUNK_ROWS):
+    n = _num_rows(columns)
+    for i in range(0, max(n, 1), chunk_rows):
+        yield {k: v[i:i + chunk_rows] for k, v in columns.items()}
+
+def records_to_columns(records):
+    # list of dicts (the older result format) -> column arrays; datetimes / timedeltas become numpy [us] arrays
+    if not records:
+        return {}
+    cols = {}
+    for k in records[0]:
+        col = [r[k] for r in records]
+        a = np.asarray(col)
+        if a.dtype == object and isinstance(col[0], timedelta):
+            a = np.asarray(col, dtype='timedelta64[us]')
+        elif a.dtype == object and isinstance(col[0], datetime):
+            a = np.asarray(col, dtype='datetime64[us]')
+        cols[k] = a
+    return cols
+
+def to_records(columns):
+    # column arrays -> list of dicts; datetime64 / timedelta64 [us] come back as datetime / timedelta objects
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*(np.asarray(columns[k]).tolist() for k in keys))]
+
+def write_table(table, path, fmt=None, chunk_rows=CHUNK_ROWS):
+    fmt = file_format(path, fmt)
+    columns = _columns(table)
+    if fmt in ('parquet', 'arrow'):
+        import pyarrow as pa
+        writer, schema = None, None
+        try:
+            for chunk in iter_chunks(columns, chunk_rows):
+                t = pa.Table.from_pydict({k: pa.array(v) for k, v in chunk.items()}, schema=schema)
+                if writer is None:
+                    schema = t.schema
+                    if fmt == 'parquet':
+                        import pyarrow.parquet as pq
+                        writer = pq.ParquetWriter(path, schema)
+                    else:
+                        writer = pa.ipc.new_file(path, schema)
+                writer.write_table(t)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            for i, chunk in enumerate(iter_chunks(columns, chunk_rows)):
+                pd.DataFrame(chunk).to_csv(f, header=i == 0, index=False)
+    else:
+        raise ValueError("export format must be parquet, arrow or csv; Excel is only written as a summary.")
+    return path
+
+def write_excel_summary(tables, path, max_rows=EXCEL_ROWS, files=None):
+    files = files or {}
+    info = []
+    with pd.ExcelWriter(path, engine="xlsxwriter") as w:
+        for name, table in tables.items():
+            columns = _columns(table)
+            n = _num_rows(columns)
+            pd.DataFrame({k: v[:max_rows] for k, v in columns.items()}).to_excel(w, sheet_name=name[:31], index=False)
+            info.append({'table': name, 'rows': n, 'rows_shown': min(n, max_rows), 'file': files.get(name, '')})
+        pd.DataFrame(info).to_excel(w, sheet_name="Info", index=False)
+    return path
+
+def _export(tables, prefix, fmt, excel, max_excel_rows, chunk_rows):
+    fmt = fmt or default_format()
+    ext = {'parquet': 'parquet', 'arrow': 'arrow', 'csv': 'csv'}[fmt]
+    paths = {}
+    for name, table in tables.items():
+        paths[name] = write_table(table, f"{prefix}_{name.lower()}.{ext}", fmt, chunk_rows)
+    if excel:
+        paths['excel'] = write_excel_summary(tables, excel, max_excel_rows, paths)
+    return paths
+
+def partition_table(part, label="cid"):
+    order = np.empty(len(part), dtype=object)
+    order[:] = list(part)
+    cid = np.fromiter(part.values(), dtype=np.int64, count=len(part))
+    idx = np.argsort(order, kind="stable")
+    return {"order": order[idx], label: cid[idx]}
+
+def group_table(part):
+    t = partition_table(part)
+    idx = np.argsort(t["cid"], kind="stable")
+    return {"cid": t["cid"][idx], "order": t["order"][idx]}
+
+def cluster_table(cluster_info):
+    cids = sorted(cluster_info)
+    return {
+        "cluster_id": np.asarray(cids, dtype=np.int64),
+        "size": np.asarray([len(cluster_info[c]["members"]) for c in cids], dtype=np.int64),
+        "load": np.asarray([cluster_info[c]["load"] for c in cids], dtype=np.float64),
+        "center": np.asarray([str(cluster_info[c]["center"]) for c in cids], dtype=object),
+        "express_ratio": np.asarray([cluster_info[c]["express_ratio"] for c in cids], dtype=np.float64),
+        "members": np.asarray([", ".join(map(str, cluster_info[c]["members"])) for c in cids], dtype=object),
+    }
+
+def clustering_tables(result):
+    return {
+        "Partition_P1": partition_table(result["p1_part"], "cid_p1"),
+        "Partition_P2": partition_table(result["p2_part"], "cid_p2"),
+        "Partition_Final": partition_table(result["part_final"], "cid_final"),
+        "Groups_Final": group_table(result["part_final"]),
+        "Cluster_Info": cluster_table(result["cluster_info"]),
+    }
+
+def export_clustering(result, prefix, fmt=None, excel=None, max_excel_rows=EXCEL_ROWS, chunk_rows=CHUNK_ROWS):
+    # result: the dict returned by dlssp_pipeline.run_pipeline_from_excel
+    return _export(clustering_tables(result), prefix, fmt, excel, max_excel_rows, chunk_rows)
+
+def export_schedule(schedule, prefix, fmt=None, excel=None, max_excel_rows=EXCEL_ROWS, chunk_rows=CHUNK_ROWS):
+    # schedule: column arrays (columnar=True from the schedulers) or the list-of-dict results
+    return _export({"Schedule": schedule}, prefix, fmt, excel, max_excel_rows, chunk_rows)
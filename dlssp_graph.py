@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import networkx as nx
+from collections import defaultdict, namedtuple
+
+OrderEdges = namedtuple("OrderEdges", ["nodes", "src", "dst", "weight"])
+
+def incidence_matrix(M: pd.DataFrame) -> sp.csr_matrix:
+    if len(M.columns) and all(isinstance(t, pd.SparseDtype) for t in M.dtypes):
+        return sp.csr_matrix(M.sparse.to_coo() > 0, dtype=np.int32)
+    return sp.csr_matrix(M.to_numpy() > 0, dtype=np.int32)
+
+def order_edges(M: pd.DataFrame, weight_mode: str = "jaccard", min_weight: float = 0.0) -> OrderEdges:
+    if weight_mode not in ("shared", "jaccard"):
+        raise ValueError("weight_mode must be 'shared' or 'jaccard'.")
+    if min_weight < 0:
+        raise ValueError("min_weight must be >= 0 (pairs without shared SKUs are never emitted).")
+    B = incidence_matrix(M)
+    # one sparse product gives the shared-SKU count of every co-occurring pair; keep i<j only
+    S = sp.triu(B @ B.T, k=1, format="csr")
+    S.sort_indices()
+    S = S.tocoo()
+    src, dst = S.row.astype(np.int64), S.col.astype(np.int64)
+    inter = S.data.astype(np.float64)
+    if weight_mode == "shared":
+        w = inter
+    else:
+        rs = np.asarray(B.sum(axis=1)).ravel().astype(np.float64)
+        w = inter / (rs[src] + rs[dst] - inter)
+    keep = w > min_weight
+    return OrderEdges(list(M.index), src[keep], dst[keep], w[keep])
+
+class CSRGraph:
+    def __init__(self, nodes, indptr, indices, weights):
+        self.nodes = list(nodes)
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        n = len(self.nodes)
+        self.rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        self.upper = self.rows <= self.indices
+        loops = self.rows == self.indices
+        self.loops = np.bincount(self.rows[loops], self.weights[loops], n)
+        # networkx convention: a self-loop adds its weight twice to the degree and once to m
+        self.degree = np.bincount(self.rows, self.weights, n) + self.loops
+        self.m = float(self.weights[self.upper].sum())
+
+    @classmethod
+    def from_edges(cls, nodes, src, dst, weight):
+        n = len(nodes)
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        weight = np.asarray(weight, dtype=np.float64)
+        off = src != dst
+        A = sp.csr_matrix((np.concatenate([weight, weight[off]]),
+                           (np.concatenate([src, dst[off]]), np.concatenate([dst, src[off]]))), shape=(n, n))
+        A.sum_duplicates()
+        A.sort_indices()
+        return cls(nodes, A.indptr, A.indices, A.data)
+
+    @classmethod
+    def from_networkx(cls, G):
+        nodes = list(G.nodes())
+        idx = {n: i for i, n in enumerate(nodes)}
+        E = [(idx[u], idx[v], d.get('weight', 1.0)) for u, v, d in G.edges(data=True)]
+        if not E:
+            return cls.from_edges(nodes, [], [], [])
+        src, dst, w = zip(*E)
+        return cls.from_edges(nodes, src, dst, w)
+
+    def to_networkx(self):
+        G = nx.Graph()
+        G.add_nodes_from(self.nodes)
+        u = self.upper
+        G.add_weighted_edges_from((self.nodes[i], self.nodes[j], w) for i, j, w in
+                                  zip(self.rows[u].tolist(), self.indices[u].tolist(), self.weights[u].tolist()))
+        return G
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return int(self.upper.sum())
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+class SKUIndex:
+    # Per-order sorted SKU code arrays plus SKU -> order posting lists. Orders are addressed by position;
+    # a removed order leaves an empty slot so the positions of the others stay valid.
+    def __init__(self):
+        self.code = {}
+        self.skus = []
+        self.order_skus = []
+        self.postings = []
+
+    @classmethod
+    def from_incidence(cls, M: pd.DataFrame):
+        idx = cls()
+        B = incidence_matrix(M)
+        B.sort_indices()
+        idx.skus = list(M.columns)
+        idx.code = {s: c for c, s in enumerate(idx.skus)}
+        idx.order_skus = [B.indices[B.indptr[i]:B.indptr[i + 1]].astype(np.int32) for i in range(B.shape[0])]
+        C = B.tocsc()
+        idx.postings = [set(C.indices[C.indptr[c]:C.indptr[c + 1]].tolist()) for c in range(B.shape[1])]
+        return idx
+
+    def add(self, skus):
+        codes = set()
+        for s in skus:
+            if s not in self.code:
+                self.code[s] = len(self.skus)
+                self.skus.append(s)
+                self.postings.append(set())
+            codes.add(self.code[s])
+        i = len(self.order_skus)
+        self.order_skus.append(np.array(sorted(codes), dtype=np.int32))
+        for c in codes:
+            self.postings[c].add(i)
+        return i
+
+    def remove(self, i):
+        for c in self.order_skus[i].tolist():
+            self.postings[c].discard(i)
+        self.order_skus[i] = np.empty(0, dtype=np.int32)
+
+    def shared(self, i):
+        # {j: number of SKUs shared with order i} over every other order that shares at least one
+        counts = defaultdict(int)
+        for c in self.order_skus[i].tolist():
+            for j in self.postings[c]:
+                counts[j] += 1
+        counts.pop(i, None)
+        return counts
+
+class CommunitySKUs:
+    # SKU multiset of every community ({sku code: number of member orders using it}), kept current as orders move
+    def __init__(self, sku_index, labels):
+        self.sku_index = sku_index
+        self.counts = defaultdict(dict)
+        for i, c in enumerate(labels):
+            self.add(i, c)
+
+    def add(self, i, c):
+        cnt = self.counts[c]
+        for s in self.sku_index.order_skus[i].tolist():
+            cnt[s] = cnt.get(s, 0) + 1
+
+    def remove(self, i, c):
+        cnt = self.counts[c]
+        for s in self.sku_index.order_skus[i].tolist():
+            if cnt[s] == 1: del cnt[s]
+            else: cnt[s] -= 1
+        if not cnt: del self.counts[c]
+
+    def move(self, i, a, b):
+        self.remove(i, a)
+        self.add(i, b)
+
+    def jaccard(self, i, c):
+        # Jaccard of order i's SKU set and the SKU union of community c
+        skus = self.sku_index.order_skus[i].tolist()
+        cnt = self.counts.get(c, {})
+        if not skus and not cnt: return 1.0
+        if not skus or not cnt: return 0.0
+        inter = sum(1 for s in skus if s in cnt)
+        return inter / (len(skus) + len(cnt) - inter)
+
+def as_csr(G) -> CSRGraph:
+    if isinstance(G, CSRGraph):
+        return G
+    if isinstance(G, OrderEdges):
+        return CSRGraph.from_edges(*G)
+    return CSRGraph.from_networkx(G)
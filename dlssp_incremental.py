@@ -0,0 +1,129 @@
+from collections import defaultdict, deque
+import numpy as np
+import pandas as pd
+from dlssp_graph import CSRGraph, SKUIndex, as_csr, order_edges
+
+class IncrementalClustering:
+    # Keeps an order graph and its partition up to date while orders arrive or are cancelled mid-shift.
+    # New edges come from the SKU -> orders posting lists, so only pairs sharing a SKU with an added order are
+    # looked at; local moving then restarts from the touched nodes only (warm-start Phase 1, queue driven),
+    # with the same closed-form dQ and lowest-label tie-break as dlssp_pipeline._local_moving.
+    def __init__(self, M: pd.DataFrame, part: dict, G=None, weight_mode="jaccard", min_weight=0.0, gamma=1.0,
+                 eps=1e-12):
+        if weight_mode not in ("shared", "jaccard"):
+            raise ValueError("weight_mode must be 'shared' or 'jaccard'.")
+        csr = as_csr(G) if G is not None else CSRGraph.from_edges(*order_edges(M, weight_mode, min_weight))
+        if csr.nodes != list(M.index):
+            raise ValueError("graph nodes must match the incidence index order.")
+        self.weight_mode, self.min_weight, self.gamma, self.eps = weight_mode, min_weight, gamma, eps
+        self.sku_index = SKUIndex.from_incidence(M)
+        self.nodes = list(csr.nodes)
+        self.index = dict(csr.index)
+        ip, ix, wt = csr.indptr.tolist(), csr.indices.tolist(), csr.weights.tolist()
+        self.adj = [dict(zip(ix[ip[i]:ip[i + 1]], wt[ip[i]:ip[i + 1]])) for i in range(len(self.nodes))]
+        self.deg = csr.degree.tolist()
+        self.m = csr.m
+        self.part = [part[n] for n in self.nodes]
+        self.tot = defaultdict(float)
+        for i, c in enumerate(self.part):
+            self.tot[c] += self.deg[i]
+        self.next_label = max(self.part, default=-1) + 1
+
+    def _weight(self, i, j, inter):
+        if self.weight_mode == "shared":
+            return float(inter)
+        return inter / (len(self.sku_index.order_skus[i]) + len(self.sku_index.order_skus[j]) - inter)
+
+    def _link(self, i, j, w):
+        self.adj[i][j] = self.adj[j][i] = w
+        self.deg[i] += w; self.deg[j] += w
+        self.tot[self.part[i]] += w; self.tot[self.part[j]] += w
+        self.m += w
+
+    def add_order(self, order, skus):
+        if order in self.index:
+            raise ValueError(f"order {order!r} is already in the graph.")
+        i = self.sku_index.add(skus)
+        self.nodes.append(order)
+        self.index[order] = i
+        self.adj.append({})
+        self.deg.append(0.0)
+        self.part.append(self.next_label)
+        self.next_label += 1
+        for j, inter in self.sku_index.shared(i).items():
+            w = self._weight(i, j, inter)
+            if w > self.min_weight:
+                self._link(i, j, w)
+        return i
+
+    def remove_order(self, order):
+        if order not in self.index:
+            raise ValueError(f"order {order!r} is not in the graph.")
+        i = self.index.pop(order)
+        # only former community mates lose pull towards their community; other neighbours lose an outside link
+        touched = [j for j in self.adj[i] if self.part[j] == self.part[i]]
+        for j, w in self.adj[i].items():
+            del self.adj[j][i]
+            self.deg[j] -= w
+            self.tot[self.part[j]] -= w
+            self.m -= w
+        self.tot[self.part[i]] -= self.deg[i]
+        self.adj[i], self.deg[i], self.part[i] = {}, 0.0, None
+        self.sku_index.remove(i)
+        return touched
+
+    def local_moving(self, seeds, depth=0):
+        # a node that moves re-queues its neighbours in other communities, up to `depth` hops from the seeds
+        m, adj, part, deg, tot, gamma, eps = self.m, self.adj, self.part, self.deg, self.tot, self.gamma, self.eps
+        if m == 0: return 0
+        two_m, two_mm = 2 * m, 2 * m * m
+        hops = {u: 0 for u in seeds if part[u] is not None}
+        queue = deque(hops)
+        moves = 0
+        while queue:
+            u = queue.popleft()
+            h = hops.pop(u)
+            cu = part[u]
+            k = defaultdict(float)
+            for v, w in adj[u].items(): k[part[v]] += w
+            k_own = k.pop(cu, 0.0)
+            if not k: continue
+            ku = deg[u]; base = tot[cu] - ku
+            dqs = {c: (kc - k_own) / two_m - gamma * ku * (tot[c] - base) / two_mm for c, kc in k.items()}
+            best_dQ = max(dqs.values())
+            if best_dQ <= eps: continue
+            chosen = min(c for c, v in dqs.items() if abs(v - best_dQ) <= eps)
+            part[u] = chosen
+            tot[cu] -= ku; tot[chosen] += ku
+            moves += 1
+            if h < depth:
+                for v in adj[u]:
+                    if part[v] != chosen and v not in hops:
+                        hops[v] = h + 1
+                        queue.append(v)
+        return moves
+
+    def update(self, added=None, removed=(), depth=0):
+        # added: {order: iterable of SKUs} or a wide incidence frame; removed: order ids. Local moving starts
+        # from the added orders and the former community mates of removed ones.
+        if isinstance(added, pd.DataFrame):
+            added = {o: added.columns[row > 0].tolist() for o, row in zip(added.index, added.to_numpy())}
+        seeds = []
+        for order in removed:
+            seeds.extend(self.remove_order(order))
+        for order, skus in (added or {}).items():
+            seeds.append(self.add_order(order, skus))
+        moves = self.local_moving(seeds, depth)
+        return self.partition(), {'seeds': len(set(seeds)), 'moves': moves}
+
+    def partition(self):
+        return {n: self.part[i] for n, i in self.index.items()}
+
+    def graph(self):
+        alive = sorted(self.index.values())
+        pos = np.full(len(self.nodes), -1, dtype=np.int64)
+        pos[alive] = np.arange(len(alive))
+        src = [pos[i] for i in alive for j in self.adj[i] if i < j]
+        dst = [pos[j] for i in alive for j in self.adj[i] if i < j]
+        w = [x for i in alive for j, x in self.adj[i].items() if i < j]
+        return CSRGraph.from_edges([self.nodes[i] for i in alive], src, dst, w)
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# Input layer shared by every entry point. Parquet and Arrow IPC are read column-wise in record batches, CSV in
+# chunks, Excel stays as the slow-path adapter. The header is validated once against a schema of
+# {column: 'number' | 'label'}; each chunk is then only cast. iter_table yields those chunks; read_table copies
+# each numeric chunk into a typed array preallocated from the row count (Parquet / Arrow metadata, a newline
+# count for CSV), so the full table is never held twice, and only the label columns are joined at the end.
+
+FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow',
+           '.csv': 'csv', '.txt': 'csv', '.xlsx': 'excel', '.xlsm': 'excel', '.xls': 'excel'}
+CHUNK_ROWS = 65_536
+
+def file_format(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(str(path))[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Unsupported input format for '{path}' (expected one of {sorted(set(FORMATS.values()))}).")
+    return fmt
+
+def _arrow_reader(path):
+    import pyarrow as pa
+    try:
+        return pa.ipc.open_file(path)
+    except pa.ArrowInvalid:
+        return pa.ipc.open_stream(path)
+
+def read_header(path, fmt=None, sheet_name=0):
+    fmt = file_format(path, fmt)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return [c for c in pq.read_schema(path).names if not c.startswith('__index_level_')]
+    if fmt == 'arrow':
+        return list(_arrow_reader(path).schema.names)
+    if fmt == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+    return list(pd.read_excel(path, sheet_name=sheet_name, nrows=0).columns)
+
+def iter_chunks(path, columns=None, fmt=None, chunksize=CHUNK_ROWS, sheet_name=0):
+    fmt = file_format(path, fmt)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == 'arrow':
+        reader = _arrow_reader(path)
+        batches = reader
+        if hasattr(reader, 'get_batch'):
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        for batch in batches:
+            yield (batch.select(columns) if columns is not None else batch).to_pandas()
+    elif fmt == 'csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    else:
+        yield pd.read_excel(path, sheet_name=sheet_name, usecols=columns)
+
+def validate_schema(columns, schema, optional=(), source=""):
+    missing = [c for c in schema if c not in columns and c not in optional]
+    if missing:
+        raise ValueError(f"{source or 'input'}: missing required column(s) {missing}; found {list(columns)}.")
+    return [c for c in schema if c in columns]
+
+def _cast(chunk, schema):
+    for c in chunk.columns:
+        if schema.get(c) == 'number' and not pd.api.types.is_numeric_dtype(chunk[c]):
+            try:
+                chunk[c] = pd.to_numeric(chunk[c])
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"column '{c}' must be numeric: {e}") from None
+    return chunk
+
+def iter_table(path, schema, optional=(), fmt=None, chunksize=CHUNK_ROWS, sheet_name=0):
+    fmt = file_format(path, fmt)
+    columns = validate_schema(read_header(path, fmt, sheet_name), schema, optional, str(path))
+    for chunk in iter_chunks(path, columns, fmt, chunksize, sheet_name):
+        yield _cast(chunk, schema)
+
+def _row_bound(path, fmt):
+    # an upper bound on the data rows, or None when only reading the data would tell
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == 'csv':
+        lines = 0
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+        return lines + 1
+    return None
+
+def read_table(path, schema, optional=(), fmt=None, chunksize=CHUNK_ROWS, sheet_name=0):
+    fmt = file_format(path, fmt)
+    columns = validate_schema(read_header(path, fmt, sheet_name), schema, optional, str(path))
+    size = _row_bound(path, fmt)
+    numeric, labels, n = {}, {c: [] for c in columns if schema[c] != 'number'}, 0
+    for chunk in iter_table(path, schema, optional, fmt, chunksize, sheet_name):
+        m = len(chunk)
+        for c in labels:
+            labels[c].append(chunk[c].reset_index(drop=True))
+        for c in columns:
+            if c in labels:
+                continue
+            values = chunk[c].to_numpy()
+            buf = numeric.get(c)
+            if buf is None:
+                buf = np.empty(max(size or 0, m), dtype=values.dtype)
+            elif buf.dtype != np.result_type(buf.dtype, values.dtype):
+                buf = buf.astype(np.result_type(buf.dtype, values.dtype))
+            if n + m > len(buf):
+                buf = np.resize(buf, max(2 * len(buf), n + m))
+            buf[n:n + m] = values
+            numeric[c] = buf
+        n += m
+    if not n:
+        return pd.DataFrame(columns=columns)
+    data = {c: numeric[c][:n] if c in numeric else
+            (pd.concat(labels[c], ignore_index=True) if len(labels[c]) > 1 else labels[c][0]) for c in columns}
+    return pd.DataFrame(data, copy=False)
+
+def read_params(path, fmt=None):
+    df = read_table(path, {'param': 'label', 'value': 'label'}, fmt=fmt)
+    params = {}
+    for key, value in zip(df['param'].astype(str).str.strip().tolist(), df['value'].tolist()):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            pass
+        params[key] = value
+    return params
+
+def incidence_from_pairs(order, sku):
+    # long format (one row per order/SKU pair) -> sparse 0/1 incidence frame, orders in first-seen order
+    order_codes, order_ids = pd.factorize(pd.Series(order), sort=False)
+    sku_codes, sku_ids = pd.factorize(pd.Series(sku), sort=False)
+    B = sp.csr_matrix((np.ones(len(order_codes), dtype=np.int32), (order_codes, sku_codes)),
+                      shape=(len(order_ids), len(sku_ids)))
+    B.data[:] = 1
+    return pd.DataFrame.sparse.from_spmatrix(B, index=list(order_ids), columns=list(sku_ids))
+
+def read_incidence(path, fmt=None, sheet_name="Incidence", chunksize=CHUNK_ROWS):
+    # wide: first column is the order id, one 0/1 column per SKU (the Excel 'Incidence' sheet layout);
+    # long: columns OrderID and SKU, one row per pair, built straight into a sparse matrix
+    fmt = file_format(path, fmt)
+    header = read_header(path, fmt, sheet_name)
+    if 'OrderID' in header and 'SKU' in header:
+        df = read_table(path, {'OrderID': 'label', 'SKU': 'label'}, fmt=fmt, chunksize=chunksize,
+                        sheet_name=sheet_name)
+        return incidence_from_pairs(df['OrderID'], df['SKU'])
+    if fmt == 'excel':
+        return pd.read_excel(path, sheet_name=sheet_name, index_col=0, engine="openpyxl")
+    # Parquet written from pandas carries its index in the metadata; otherwise the first column is the order id
+    chunks = list(iter_chunks(path, None, fmt, chunksize))
+    df = pd.concat(chunks, ignore_index=isinstance(chunks[0].index, pd.RangeIndex))
+    if isinstance(df.index, pd.RangeIndex):
+        df = df.set_index(df.columns[0])
+    return _cast(df.rename_axis(None), dict.fromkeys(df.columns, 'number'))
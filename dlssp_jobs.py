@@ -0,0 +1,220 @@
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+import traceback
+from collections import deque
+import dlssp_trace as trace
+from dlssp_export import export_clustering, export_schedule
+
+# Pipeline runs in a child process, one job at a time from a FIFO of input files. The child streams batched
+# events back through a multiprocessing queue: its stdout as 'log' text, phase starts / ends, and the latest
+# progress report per kind (Louvain pass, ALNS iteration and best objective), at most every BATCH_INTERVAL
+# seconds. The GUI (or any caller) drains them with poll() from its own loop, so no widget is touched off the
+# main thread. cancel() sets an event the child checks at every trace hook; a child that does not stop within
+# CANCEL_GRACE seconds (e.g. still reading a large workbook) is terminated.
+
+JOB_TARGETS = {
+    'louvain': 'dlssp_pipeline:run_pipeline_from_excel',
+    'alns': 'dlssp_alns_cluster:run_pipeline',
+    'greedy': 'dlssp_pipeline_optimized:run_pipeline_from_excel',
+    'online': 'dlssp_online:run_online',
+}
+BATCH_INTERVAL = 0.2
+CANCEL_GRACE = 5.0
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    def __init__(self, job_id, path, target, kwargs):
+        self.id = job_id
+        self.path = path
+        self.target = target
+        self.kwargs = kwargs
+        self.state = QUEUED
+        self.out = None
+        self.error = None
+        self.progress = {}
+        self.phase = None
+        self.started = None
+        self.finished = None
+
+    def __repr__(self):
+        return f"Job({self.id}, {os.path.basename(self.path)!r}, {self.state})"
+
+class _Batcher:
+    # child side: log text and phase events in order, progress reports coalesced to the latest one per kind
+    def __init__(self, job_id, q):
+        self.job_id = job_id
+        self.q = q
+        self.log = []
+        self.events = []
+        self.latest = {}
+        self.last = time.monotonic()
+
+    def write(self, text):
+        self.log.append(text)
+        self.maybe_flush()
+
+    def flush(self):
+        pass
+
+    def add(self, kind, fields):
+        if kind == 'phase':
+            self.events.append((kind, fields))
+        else:
+            self.latest[kind] = fields
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last >= BATCH_INTERVAL:
+            self.send()
+
+    def send(self, *final):
+        batch = ([('log', ''.join(self.log))] if self.log else []) + self.events + list(self.latest.items())
+        batch.extend(final)
+        if batch:
+            self.q.put((self.job_id, batch))
+        self.log, self.events, self.latest = [], [], {}
+        self.last = time.monotonic()
+
+def _resolve(target):
+    module, func = JOB_TARGETS.get(target, target).split(':')
+    return getattr(importlib.import_module(module), func)
+
+def _save(result, path):
+    # full tables (Parquet, or CSV without pyarrow) next to the input, plus a capped Excel summary
+    base = os.path.splitext(path)[0] + "_result"
+    if isinstance(result, dict) and 'part_final' in result:
+        return export_clustering(result, base, excel=base + ".xlsx")['excel']
+    if isinstance(result, (list, dict)):
+        return export_schedule(result, base, excel=base + ".xlsx")['excel']
+    return None
+
+def _job_main(job_id, target, path, kwargs, q, cancel):
+    batcher = _Batcher(job_id, q)
+    sys.stdout = sys.stderr = batcher
+
+    def listener(kind, fields):
+        batcher.add(kind, fields)
+        if cancel.is_set():
+            raise JobCancelled()
+
+    trace.enable(listener=listener)
+    try:
+        out = _save(_resolve(target)(path, **kwargs), path)
+        final = (DONE, {'out': out})
+    except JobCancelled:
+        final = (CANCELLED, {})
+    except Exception as e:
+        traceback.print_exc()
+        final = (FAILED, {'error': f"{type(e).__name__}: {e}"})
+    finally:
+        trace.disable()
+    batcher.send(final)
+
+class JobRunner:
+    def __init__(self, start_method=None):
+        self.ctx = mp.get_context(start_method)
+        self.q = self.ctx.Queue()
+        self.jobs = {}
+        self.pending = deque()
+        self.current = None          # (job, process, cancel event, time cancel was asked)
+        self.next_id = 1
+
+    def submit(self, path, target='louvain', **kwargs):
+        job = Job(self.next_id, path, target, kwargs)
+        self.next_id += 1
+        self.jobs[job.id] = job
+        self.pending.append(job)
+        self._start_next()
+        return job
+
+    def submit_batch(self, paths, target='louvain', **kwargs):
+        return [self.submit(p, target, **kwargs) for p in paths]
+
+    def _start_next(self):
+        if self.current is not None or not self.pending:
+            return
+        job = self.pending.popleft()
+        cancel = self.ctx.Event()
+        # not a daemon: the ALNS and greedy pipelines start worker pools of their own; shutdown() reaps it
+        proc = self.ctx.Process(target=_job_main, args=(job.id, job.target, job.path, job.kwargs, self.q, cancel))
+        proc.start()
+        job.state, job.started = RUNNING, time.time()
+        self.current = [job, proc, cancel, None]
+
+    def cancel(self, job_id=None):
+        # job_id=None cancels the running job; queued jobs are dropped straight away
+        if job_id is None and self.current is not None:
+            job_id = self.current[0].id
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in (QUEUED, RUNNING):
+            return False
+        if job.state == QUEUED:
+            self.pending.remove(job)
+            job.state, job.finished = CANCELLED, time.time()
+            return True
+        if self.current[3] is None:
+            self.current[2].set()
+            self.current[3] = time.monotonic()
+        return True
+
+    def cancel_all(self):
+        for job in list(self.pending):
+            self.cancel(job.id)
+        self.cancel()
+
+    def busy(self):
+        return self.current is not None or bool(self.pending)
+
+    def poll(self):
+        # drain what the child sent, finish / reap / start jobs; returns [(job, kind, payload)] in arrival order
+        out = []
+        while True:
+            try:
+                job_id, batch = self.q.get_nowait()
+            except queue.Empty:
+                break
+            job = self.jobs[job_id]
+            for kind, payload in batch:
+                if kind == 'phase':
+                    job.phase = payload['phase'] if payload.get('state') == 'start' else None
+                elif kind in (DONE, FAILED, CANCELLED):
+                    job.state, job.finished = kind, time.time()
+                    job.out, job.error = payload.get('out'), payload.get('error')
+                elif kind != 'log':
+                    job.progress[kind] = payload
+                out.append((job, kind, payload))
+        if self.current is not None:
+            job, proc, cancel, asked = self.current
+            if job.state != RUNNING:
+                proc.join(timeout=1.0)
+                self.current = None
+            elif asked is not None and time.monotonic() - asked > CANCEL_GRACE:
+                proc.terminate()
+                proc.join(timeout=1.0)
+                job.state, job.finished = CANCELLED, time.time()
+                out.append((job, CANCELLED, {'terminated': True}))
+                self.current = None
+            elif not proc.is_alive() and self.q.empty():
+                job.state, job.finished = FAILED, time.time()
+                job.error = f"worker exited with code {proc.exitcode}"
+                out.append((job, FAILED, {'error': job.error}))
+                self.current = None
+        self._start_next()
+        return out
+
+    def shutdown(self, timeout=CANCEL_GRACE):
+        self.cancel_all()
+        if self.current is not None:
+            proc = self.current[1]
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=1.0)
+            self.current = None
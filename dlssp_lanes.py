@@ -0,0 +1,94 @@
+import bisect
+import heapq
+from collections import namedtuple
+import numpy as np
+from dlssp_io import read_table
+
+# Discharge lane layout and order -> lane assignment. A lane's speed scales the time of everything it handles,
+# so an order of work w with q units from a tray at distance d takes (w + q*d) / speed on that lane.
+# greedy: release order, least-loaded lane; lpt: longest order first, earliest-finishing lane (makespan
+# balancing); travel: release order, earliest finish including the travel to the order's SKU tray. Loads sit in
+# heaps (one per speed class), so a pick is O(log L) and travel mode only looks at the lanes nearest the tray
+# plus the least-loaded ones.
+
+LaneLayout = namedtuple("LaneLayout", ["ids", "pos", "speed"])
+LANE_SCHEMA = {'lane_id': 'label', 'l_pos': 'number', 'speed': 'number'}
+LANE_MODES = ("greedy", "lpt", "travel")
+
+def lane_layout(params=None, lanes_file=None, sheet_name=0):
+    # a lanes table (lane_id, l_pos[, speed]) wins; otherwise n_lanes lanes lane_spacing apart from params
+    if lanes_file:
+        df = read_table(lanes_file, LANE_SCHEMA, optional=('speed',), sheet_name=sheet_name)
+        speed = df['speed'].to_numpy(dtype=np.float64) if 'speed' in df else np.ones(len(df))
+        return LaneLayout(df['lane_id'].tolist(), df['l_pos'].to_numpy(dtype=np.float64), speed)
+    params = params or {}
+    n = int(params.get('n_lanes', 3))
+    return LaneLayout(list(range(1, n + 1)), np.arange(n) * float(params.get('lane_spacing', 10)),
+                      np.full(n, float(params.get('lane_speed', 1.0))))
+
+def lane_positions(layout):
+    return dict(zip(layout.ids, layout.pos.tolist()))
+
+def lane_speeds(layout):
+    return dict(zip(layout.ids, layout.speed.tolist()))
+
+class _LaneHeaps:
+    # one (load, lane) heap per distinct speed; stale entries are skipped lazily
+    def __init__(self, speed):
+        self.speed = [float(s) for s in speed]
+        self.load = [0.0] * len(self.speed)
+        self.heaps = {}
+        for l, s in enumerate(self.speed):
+            self.heaps.setdefault(s, []).append((0.0, l))
+
+    def top(self, s):
+        heap = self.heaps[s]
+        while heap[0][0] != self.load[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def least_loaded(self):
+        return min(self.top(s) for s in self.heaps)[1]
+
+    def earliest_finish(self, w):
+        return min((load + w / s, l) for s in self.heaps for load, l in [self.top(s)])[1]
+
+    def add(self, l, t):
+        self.load[l] += t
+        heapq.heappush(self.heaps[self.speed[l]], (self.load[l], l))
+
+def assign_lane_indices(work, layout, mode="greedy", quantity=None, sku_pos=None, order=None, candidates=8):
+    # index into layout.ids for every order; `order` is the processing order for greedy/travel (default: as given)
+    if mode not in LANE_MODES:
+        raise ValueError(f"lane mode must be one of {LANE_MODES}.")
+    work = np.asarray(work, dtype=np.float64).tolist()
+    n = len(work)
+    lanes = _LaneHeaps(layout.speed)
+    speed = lanes.speed
+    out = np.empty(n, dtype=np.int64)
+    if mode == "lpt":
+        for i in sorted(range(n), key=lambda i: -work[i]):
+            l = out[i] = lanes.earliest_finish(work[i])
+            lanes.add(l, work[i] / speed[l])
+        return out
+    seq = range(n) if order is None else order
+    if mode == "greedy":
+        for i in seq:
+            l = out[i] = lanes.least_loaded()
+            lanes.add(l, work[i] / speed[l])
+        return out
+    if quantity is None or sku_pos is None:
+        raise ValueError("travel mode needs quantity and sku_pos.")
+    quantity = np.asarray(quantity, dtype=np.float64).tolist()
+    sku_pos = np.asarray(sku_pos, dtype=np.float64).tolist()
+    by_pos = np.argsort(layout.pos, kind="stable").tolist()
+    sorted_pos = [float(layout.pos[l]) for l in by_pos]
+    pos = [float(p) for p in layout.pos]
+    for i in seq:
+        p = bisect.bisect_left(sorted_pos, sku_pos[i])
+        near = by_pos[max(0, p - candidates // 2):p + candidates // 2 + 1]
+        cand = set(near) | {lanes.top(s)[1] for s in lanes.heaps}
+        cost = {l: lanes.load[l] + (work[i] + quantity[i] * abs(pos[l] - sku_pos[i])) / speed[l] for l in cand}
+        l = out[i] = min(cand, key=lambda l: (cost[l], l))
+        lanes.add(l, cost[l] - lanes.load[l])
+    return out
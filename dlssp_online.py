@@ -0,0 +1,217 @@
+import math
+import random
+import time
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import dlssp_alns_cluster as alns
+import dlssp_trace as trace
+from dlssp_alns_ops import operator_groups
+from dlssp_io import read_table
+from dlssp_lanes import lane_layout, lane_positions
+from dlssp_schedule import ObjectiveEvaluator, ScheduleState, decode_chains, to_us, NO_CAP
+
+# Rolling-horizon scheduling for a sorter that runs continuously. Orders are added as they are released and
+# replan(now) runs every few minutes. In each lane, the prefix of orders whose planned start has passed is frozen,
+# handed back and forgotten; the lane keeps only the completion of its last frozen order, which the next open order
+# takes as its predecessor, as in the batch chain. An order further down that started at its wave cap stays open
+# but pinned to that start. The open orders keep their lane sequence as the warm start and a new order goes in
+# front of the first open order of its lane released after it. The ALNS then re-optimises the window, the lane
+# prefixes planned to start within `horizon` minutes; the tail keeps its order and is only re-timed. Nothing else
+# may start before now. Without new orders a replan only freezes, so the plan stays as it was. The search stops at
+# the cycle's latency budget, less the time the last cycle needed around the search. Memory follows the open
+# orders, not the whole day.
+
+Replan = namedtuple("Replan", ["now", "frozen", "plan", "score", "window", "iterations", "wall_s"])
+NO_READY = np.iinfo(np.int64).min // 4
+
+class OnlineScheduler:
+    def __init__(self, params, lane_positions, tray_positions=None, horizon=None, budget_s=None, seed=None,
+                 columnar=False):
+        # horizon in minutes (param online_horizon, 60), budget_s per replan (param online_budget_s, 2.0)
+        self.params = params
+        self.lane_positions = lane_positions
+        self.tray_positions = tray_positions
+        self.horizon = float(horizon if horizon is not None else params.get('online_horizon', 60))
+        self.budget_s = float(budget_s if budget_s is not None else params.get('online_budget_s', 2.0))
+        self.iters = int(params.get('online_iters', params.get('alns_iters', 200)))
+        self.theta = float(params.get('theta', 0.3))
+        self.rng = random.Random(alns._alns_seed(params, seed))
+        self.columnar = columnar
+        self.origin = alns._origin()
+        self.open = None
+        self.fresh = False
+        self.added = 0
+        self.now_us = None
+        self.score = 0.0
+        self.lane_ready = {}
+        self.lane_total = {}
+        self.wave_min = {}
+        self.overhead = 0.0
+
+    def __len__(self):
+        return 0 if self.open is None else len(self.open)
+
+    def add_orders(self, orders_df):
+        # released orders (OrderID, Wave, ReleaseTime, SKU, Quantity, Lane, LaneSpeed ...); times in minutes
+        if len(orders_df) == 0:
+            return
+        data = alns._order_arrays(orders_df, self.params, self.lane_positions, self.tray_positions)
+        df = data['df']
+        for w, r in df.groupby(data['wave'])['ReleaseTime'].min().items():
+            self.wave_min[w] = min(self.wave_min.get(w, math.inf), r)
+        for l, d in pd.Series(data['duration']).groupby(data['lane']).sum().items():
+            self.lane_total[l] = self.lane_total.get(l, 0) + int(d)
+        new = pd.DataFrame({'OrderID': df['OrderID'].to_numpy(), 'Wave': data['wave'], 'Lane': data['lane'],
+                            'SKU': df['SKU'].to_numpy(), 'TrayPos': data['sku_pos'], 'release': data['release'],
+                            'travel': data['travel'], 'induction': data['induction'], 'duration': data['duration'],
+                            'sla': data['sla'], 'arrival': self.added + np.arange(len(df)), 'planned': False,
+                            'seq': -1, 'start': data['release'], 'completion': data['release'] + data['duration']})
+        self.added += len(df)
+        self.open = new if self.open is None else pd.concat([self.open, new], ignore_index=True)
+        self.fresh = True
+
+    def _empty(self):
+        return self.open.iloc[:0] if self.open is not None else pd.DataFrame(columns=['OrderID'])
+
+    def _data(self, df):
+        # the dict alns._results reads; lane imbalance is over all the work released so far
+        return {'df': df, 'lane_total': self.lane_total, 'wave': df['Wave'].to_numpy(),
+                'lane': df['Lane'].to_numpy(), 'sku_pos': df['TrayPos'].to_numpy(),
+                'travel': df['travel'].to_numpy(dtype=np.int64), 'induction': df['induction'].to_numpy(dtype=np.int64),
+                'sla': df['sla'].to_numpy(dtype=np.int64), 'duration': df['duration'].to_numpy(dtype=np.int64)}
+
+    def _results(self, df):
+        if len(df) == 0:
+            return {} if self.columnar else []
+        return alns._results(self._data(df), self.params, self.origin, df['start'].to_numpy(dtype=np.int64),
+                             df['completion'].to_numpy(dtype=np.int64), self.columnar)
+
+    def _freeze(self, now_us=None):
+        # per lane, the planned orders in sequence as long as they have started by now_us (all of them for None)
+        df = self.open
+        planned = df[df['planned']].sort_values('seq')
+        if now_us is None:
+            mark = pd.Series(True, index=planned.index)
+        else:
+            mark = (planned['start'] <= now_us).groupby(planned['Lane']).cummin()
+        frozen = planned[mark.to_numpy()]
+        for l, c in frozen.groupby('Lane')['completion'].last().items():
+            self.lane_ready[l] = int(c)
+        self.open = df.drop(frozen.index).reset_index(drop=True)
+        if len(self.open):
+            # a wave's cap only reads the wave before it
+            oldest = self.open['Wave'].min() - 1
+            self.wave_min = {w: r for w, r in self.wave_min.items() if w >= oldest}
+        return self._results(frozen.sort_values(['start', 'seq']).reset_index(drop=True))
+
+    def _search(self, now_us, t0):
+        df = self.open
+        planned = df['planned'].to_numpy()
+        # lane positions: open planned orders keep their sequence, a new order goes in front of the first one
+        # released after it (its prefix max of release passes the new release there)
+        pos = np.zeros(len(df), dtype=np.int64)
+        kept = df[planned].sort_values('seq')
+        pos[kept.index] = kept.groupby('Lane').cumcount().to_numpy()
+        reach = kept['release'].groupby(kept['Lane']).cummax()
+        new = df[~planned]
+        for l, rows in new.groupby('Lane'):
+            pos[rows.index] = np.searchsorted(reach[kept['Lane'] == l].to_numpy(), rows['release'].to_numpy(),
+                                              side='right')
+        codes = pd.factorize(df['Lane'])[0]
+        order = np.lexsort((df['arrival'].to_numpy(), df['release'].to_numpy(), planned, pos, codes))
+        df = df.iloc[order].reset_index(drop=True)
+        lane = df['Lane'].to_numpy()
+        release = np.maximum(df['release'].to_numpy(dtype=np.int64), now_us)
+        prev = df['Wave'].map({w: self.wave_min.get(w - 1, math.nan) for w in df['Wave'].unique()})
+        cap = np.where(prev.isna(), NO_CAP, to_us(prev.fillna(0).to_numpy() * self.theta))
+        cap = np.maximum(cap, now_us)
+        # an open order that has started did so at its cap, behind one that has not; it keeps that start
+        started = (df['planned'] & (df['start'] <= now_us)).to_numpy()
+        release[started] = cap[started] = df['start'].to_numpy(dtype=np.int64)[started]
+        duration, sla = df['duration'].to_numpy(dtype=np.int64), df['sla'].to_numpy(dtype=np.int64)
+        ready = df['Lane'].map(self.lane_ready).fillna(NO_READY).to_numpy(dtype=np.int64)
+        key = np.where(df['planned'], df['start'], release)
+        inside = pd.Series(key < now_us + to_us(self.horizon)).groupby(codes[order]).cummin().to_numpy()
+        win, tail = np.flatnonzero(inside), np.flatnonzero(~inside)
+        iterations, search = 0, 0.0
+        if len(win):
+            state = ScheduleState(lane[win], release[win], duration[win], cap[win], sla[win],
+                                  sequence=np.arange(len(win)), ready=self.lane_ready)
+            # lane imbalance is a constant of the lane assignment, so the window search leaves it out
+            evaluator = ObjectiveEvaluator(self.params, release[win], sla[win])
+            groups = operator_groups(df['Wave'].to_numpy()[win], df['SKU'].to_numpy()[win])
+            deadline = t0 + max(self.budget_s - self.overhead, 0.0)
+            s0 = time.perf_counter()
+            self.score, seq, curve, _, _ = alns._alns_search(state, evaluator, self.params, self.rng, self.iters,
+                                                             groups, deadline=deadline)
+            search = time.perf_counter() - s0
+            iterations = len(curve)
+            win = win[np.asarray(seq, dtype=np.int64)]
+        sequence = np.r_[win, tail]
+        df['start'], df['completion'] = decode_chains(lane, release, duration, cap, sequence, ready)
+        df['planned'] = True
+        df.loc[sequence, 'seq'] = np.arange(len(df))
+        self.open, self.fresh = df, False
+        return len(win), iterations, search
+
+    def replan(self, now):
+        # now in minutes, on the ReleaseTime clock
+        t0 = time.perf_counter()
+        self.now_us = now_us = int(to_us(now))
+        n = iterations = 0
+        search = 0.0
+        with trace.phase("online.replan"):
+            frozen = self._freeze(now_us) if len(self) else self._results(self._empty())
+            if self.fresh and len(self):
+                n, iterations, search = self._search(now_us, t0)
+            plan = self._results(self.open if self.open is not None else self._empty())
+            wall = time.perf_counter() - t0
+        if iterations:
+            # what a cycle spends outside the search, smoothed, is held back from the next search's budget
+            self.overhead = 0.5 * self.overhead + 0.5 * (wall - search)
+        trace.progress("online", now=now, open=len(self), window=n, iterations=iterations, wall_s=round(wall, 3))
+        return Replan(now, frozen, plan, self.score, n, iterations, wall)
+
+    def finish(self):
+        # no more orders: orders added since the last replan are planned in, then everything left is frozen
+        if not len(self):
+            return self._results(self._empty())
+        if self.fresh:
+            self._search(self.now_us if self.now_us is not None else int(self.open['release'].min()),
+                         time.perf_counter())
+        return self._freeze()
+
+def _concat(chunks, columnar):
+    if columnar:
+        chunks = [c for c in chunks if c]
+        return {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]} if chunks else {}
+    return [r for c in chunks for r in c]
+
+def run_online(orders_file="orders.xlsx", params_file="params.xlsx", lanes_file=None, every=None, columnar=False,
+               tray_positions=None, sink=None, partition=None):
+    # replays an order file as a stream: every `every` minutes (param online_every, 5) the orders released so far
+    # are added and the plan is redone. Frozen orders go to sink(chunk) as they are inducted when given (so the
+    # output is not held either), else are collected and returned in induction order. Lanes and trays are set up
+    # as in alns.run_pipeline (partition, tray_mode), unless tray_positions are given.
+    with trace.phase("load"):
+        orders_df = read_table(orders_file, alns.ORDER_SCHEMA, optional=('Wave', 'ProcessingTime', 'PackingTime',
+                                                                         'Lane', 'LaneSpeed'))
+        params = alns.load_params(params_file)
+        layout = lane_layout(params, lanes_file)
+    orders_df, tray_positions = alns.prepare_orders(orders_df, params, layout, partition, tray_positions)
+    orders_df = orders_df.sort_values(by='ReleaseTime', kind='stable').reset_index(drop=True)
+    every = float(every or params.get('online_every', 5))
+    scheduler = OnlineScheduler(params, lane_positions(layout), tray_positions, columnar=columnar)
+    release = orders_df['ReleaseTime'].to_numpy(dtype=np.float64)
+    out = []
+    emit = sink or out.append
+    done, now = 0, release[0] if len(release) else 0.0
+    while done < len(release):
+        upto = int(np.searchsorted(release, now, side='right'))
+        scheduler.add_orders(orders_df.iloc[done:upto])
+        done = upto
+        emit(scheduler.replan(now).frozen)
+        now += every
+    emit(scheduler.finish())
+    return None if sink else _concat(out, columnar)
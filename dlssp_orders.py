@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# Columnar order store: one NumPy structured array for the numeric columns and integer codes for labels
+# (order id, SKU, lane), instead of one Python object with a __dict__ per order. Code that wants per-order
+# objects gets OrderView, a two-slot handle whose attributes read and write the store's columns.
+
+FIELDS = {'order_id': 'OrderID', 'sku': 'SKU', 'wave': 'Wave', 'release_time': 'ReleaseTime',
+          'packing_time': 'PackingTime', 'processing_time': 'ProcessingTime', 'quantity': 'Quantity',
+          'lane': 'Lane', 'lane_speed': 'LaneSpeed'}
+LABELS = ('order_id', 'sku', 'lane')
+STATE = {'start_time': np.float64, 'completion_time': np.float64, 'travel_time': np.float64,
+         'wait_time': np.float64, 'tardiness': np.float64, 'sla_violation': np.bool_}
+
+class OrderStore:
+    def __init__(self, n, fields):
+        # fields: [(name, numpy dtype)] for the input columns; label fields are always int32 codes
+        self.n = n
+        self.columns = [name for name, _ in fields]
+        self.uniques, self.codes = {}, {}
+        dtype = [(name, np.int32 if name in LABELS else t) for name, t in fields] + list(STATE.items())
+        self.data = np.zeros(n, dtype=dtype)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        fields = [(f, np.int64 if df[c].dtype.kind in 'iu' else np.float64) for f, c in FIELDS.items() if c in df]
+        columns = [f for f, _ in fields]
+        if 'lane' not in columns:
+            fields.append(('lane', np.int32))
+            columns.append('lane')
+        store = cls(len(df), fields)
+        for f in columns:
+            if f in LABELS:
+                codes, uniques = (pd.factorize(df[FIELDS[f]], sort=False) if FIELDS[f] in df
+                                  else (np.full(len(df), -1), np.empty(0, dtype=object)))
+                store.data[f] = codes
+                store.uniques[f] = uniques
+            else:
+                store.data[f] = df[FIELDS[f]].to_numpy()
+        return store
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if i < 0: i += self.n
+        if not 0 <= i < self.n: raise IndexError(i)
+        return OrderView(self, i)
+
+    def __iter__(self):
+        return (OrderView(self, i) for i in range(self.n))
+
+    def column(self, name):
+        # decoded column: label values for label fields, the raw array otherwise
+        if name in LABELS:
+            codes = self.data[name]
+            out = np.full(self.n, None, dtype=object)
+            ok = codes >= 0
+            out[ok] = np.asarray(self.uniques[name], dtype=object)[codes[ok]]
+            return out
+        return self.data[name]
+
+    def get(self, name, i):
+        if name in LABELS:
+            c = self.data[name][i]
+            if c < 0: return None
+            v = self.uniques[name][c]
+            return v.item() if isinstance(v, np.generic) else v
+        return self.data[name][i].item()
+
+    def set(self, name, i, value):
+        if name in LABELS:
+            if name not in self.codes:
+                self.uniques[name] = list(self.uniques.get(name, []))
+                self.codes[name] = {v: c for c, v in enumerate(self.uniques[name])}
+            c = self.codes[name].get(value)
+            if c is None:
+                c = self.codes[name][value] = len(self.uniques[name])
+                self.uniques[name].append(value)
+            self.data[name][i] = c
+        else:
+            self.data[name][i] = value
+
+    def set_labels(self, name, values):
+        # whole label column at once, e.g. the lane of every order after assignment
+        codes, uniques = pd.factorize(pd.Series(list(values), dtype=object), sort=False)
+        self.data[name] = codes
+        self.uniques[name] = uniques
+        self.codes.pop(name, None)
+
+    def to_frame(self, state=False):
+        # back to the input column names (Lane only once assigned), plus the schedule columns if state=True
+        cols = {FIELDS[f]: (pd.Series(self.column(f)).infer_objects() if f in LABELS else self.data[f])
+                for f in self.columns if f != 'lane' or (self.data['lane'] >= 0).any()}
+        if state:
+            cols.update({f: self.data[f] for f in STATE})
+        return pd.DataFrame(cols)
+
+class OrderView:
+    __slots__ = ('store', 'i')
+
+    def __init__(self, store, i):
+        self.store = store
+        self.i = i
+
+    def __repr__(self):
+        return f"OrderView({self.store.get('order_id', self.i)!r})"
+
+def _field(name):
+    return property(lambda self: self.store.get(name, self.i), lambda self, v: self.store.set(name, self.i, v))
+
+for _name in list(FIELDS) + list(STATE):
+    setattr(OrderView, _name, _field(_name))
@@ -1,27 +1,23 @@
 import math
+import time
 import pandas as pd
 import networkx as nx
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import datetime
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from dlssp_graph import CSRGraph, CommunitySKUs, SKUIndex, as_csr, incidence_matrix, order_edges
+from dlssp_cache import GraphCache, cache_key, incidence_hash
+from dlssp_io import read_incidence
+import dlssp_trace as trace
 
 def build_order_graph(M: pd.DataFrame, weight_mode: str = "jaccard", min_weight: float = 0.0) -> nx.Graph:
-    orders = list(M.index)
+    E = order_edges(M, weight_mode, min_weight)
     G = nx.Graph()
-    G.add_nodes_from(orders)
-    bin_sets = {o: set(M.columns[M.loc[o] > 0]) for o in orders}
-    for i in range(len(orders)):
-        for j in range(i+1, len(orders)):
-            o1, o2 = orders[i], orders[j]
-            inter = bin_sets[o1] & bin_sets[o2]
-            if weight_mode == "shared":
-                w = float(len(inter))
-            elif weight_mode == "jaccard":
-                uni = bin_sets[o1] | bin_sets[o2]
-                w = float(len(inter))/float(len(uni)) if len(uni) > 0 else 0.0
-            else:
-                raise ValueError("weight_mode must be 'shared' or 'jaccard'.")
-            if w > min_weight:
-                G.add_edge(o1,o2,weight=w)
+    G.add_nodes_from(E.nodes)
+    G.add_weighted_edges_from((E.nodes[i], E.nodes[j], w)
+                              for i, j, w in zip(E.src.tolist(), E.dst.tolist(), E.weight.tolist()))
     return G
 
 def partition_to_groups(part: dict) -> dict:
@@ -32,166 +28,481 @@ def partition_to_groups(part: dict) -> dict:
         groups[k].sort()
     return dict(sorted(groups.items(), key=lambda kv: kv[0]))
 
-def _weighted_degree(G, n):
-    return sum(d.get('weight',1.0) for _, _, d in G.edges(n, data=True))
+def _labels_array(csr, part):
+    cmap={}
+    return np.array([cmap.setdefault(part[n],len(cmap)) for n in csr.nodes],dtype=np.int64)
 
 def _modularity_gamma(G, part, gamma=1.0):
-    m = sum(d.get('weight',1.0) for *_, d in G.edges(data=True))
+    csr=as_csr(G)
+    return _modularity_labels(csr,_labels_array(csr,part),gamma)
+
+def _modularity_labels(csr, lab, gamma=1.0):
+    # lab: one non-negative community index per csr node
+    m=csr.m
     if m == 0: return 0.0
-    tot = defaultdict(float)
-    intra = defaultdict(float)
-    for n,c in part.items():
-        tot[c] += _weighted_degree(G,n)
-    for u,v,d in G.edges(data=True):
-        if part[u]==part[v]:
-            intra[part[u]] += d.get('weight',1.0)
-    Q = 0.0
-    for c in set(part.values()):
-        Sigma_in = intra.get(c,0.0)
-        Sigma_tot = tot.get(c,0.0)
-        Q += (Sigma_in/(2*m)) - gamma*(Sigma_tot**2)/(4*m*m)
-    return Q
-
-def _community_bin_union(M: pd.DataFrame, members: list) -> set:
-    if not members: return set()
-    sub = M.loc[members]
-    return set(sub.columns[(sub.sum(axis=0) > 0)])
-
-def _jaccard(a: set, b: set) -> float:
-    if not a and not b: return 1.0
-    if not a or not b: return 0.0
-    return len(a & b)/len(a | b)
-
-def _violations_of(part,max_size:int)->int:
-    sizes=defaultdict(int)
-    for _,cid in part.items(): sizes[cid]+=1
-    return sum(max(0,s-max_size) for s in sizes.values())
+    same=csr.upper & (lab[csr.rows]==lab[csr.indices])
+    intra=float(csr.weights[same].sum())
+    tot=np.bincount(lab,csr.degree)
+    return intra/(2*m) - gamma*float((tot**2).sum())/(4*m*m)
 
-def louvain_phase1_verbose(G,M,gamma=1.0,eps=1e-12):
-    def _tie_tuple_P1(u, cand_cid, part):
-        members=[x for x,c in part.items() if c==cand_cid]
-        k_in=sum(G[u][v]['weight'] for v in members if G.has_edge(u,v))
-        deg_u=sum(d.get('weight',1.0) for _,_,d in G.edges(u,data=True))
-        k_out=max(deg_u-k_in,0.0)
-        Bu=set(M.columns[M.loc[u]>0])
-        Uc=_community_bin_union(M,members)
-        jac=_jaccard(Bu,Uc)
-        return (k_in,jac,-k_out,-cand_cid)
-    
-    nodes=list(G.nodes())
-    part={n:i for i,n in enumerate(nodes)}
+def _local_moving(csr,part,gamma=1.0,eps=1e-12,tie=None,moved=None):
+    # Closed-form dQ for the (Sigma_in/2m - gamma*Sigma_tot^2/4m^2) modularity used by _modularity_gamma:
+    # moving u from a to b changes Q by (k_ub-k_ua)/2m - gamma*k_u*(tot_b-tot_a+k_u)/2m^2.
+    m=csr.m
+    if m==0: return part,0
+    ip,ix,wt=csr.indptr.tolist(),csr.indices.tolist(),csr.weights.tolist()
+    deg,loops=csr.degree.tolist(),csr.loops.tolist()
+    tot=defaultdict(float)
+    for i,c in enumerate(part): tot[c]+=deg[i]
+    moves=passes=evals=0
     while True:
         moved_this_pass=0
-        for u in nodes:
+        passes+=1
+        for u in range(len(part)):
             cu=part[u]
-            neighbor_cids=sorted(set(part[v] for v in G.neighbors(u))-{cu})
-            if not neighbor_cids: continue
-            baseQ=_modularity_gamma(G,part,gamma)
-            dqs={cand:_modularity_gamma(G,{**part,u:cand},gamma)-baseQ for cand in neighbor_cids}
+            k=defaultdict(float)
+            for v,w in zip(ix[ip[u]:ip[u+1]],wt[ip[u]:ip[u+1]]): k[part[v]]+=w
+            k_own=k.pop(cu,0.0)-loops[u]
+            if not k: continue
+            evals+=len(k)
+            ku=deg[u]; base=tot[cu]-ku
+            dqs={c:(k[c]-k_own)/(2*m)-gamma*ku*(tot[c]-base)/(2*m*m) for c in sorted(k)}
             best_dQ=max(dqs.values())
             if best_dQ<=eps: continue
             best_cands=[c for c,v in dqs.items() if abs(v-best_dQ)<=eps]
-            chosen=best_cands[0] if len(best_cands)==1 else max(best_cands,key=lambda c:_tie_tuple_P1(u,c,part))
+            if len(best_cands)==1: chosen=best_cands[0]
+            elif tie is None: chosen=min(best_cands)
+            else: chosen=max(best_cands,key=lambda c:tie(u,c,k[c]))
             part[u]=chosen
+            tot[cu]-=ku; tot[chosen]+=ku
+            if moved: moved(u,cu,chosen)
             moved_this_pass+=1
+        moves+=moved_this_pass
+        trace.progress("louvain",passes=passes,moves=moves)
         if moved_this_pass==0: break
-    return part
+    trace.count("louvain.passes",passes); trace.count("louvain.dq_evals",evals); trace.count("louvain.moves",moves)
+    return part,moves
+
+def _adjacency(csr):
+    n=csr.number_of_nodes()
+    return sp.csr_matrix((csr.weights,csr.indices,csr.indptr),shape=(n,n))
+
+def _best_moves(csr,lab,gamma=1.0,eps=1e-12,A=None):
+    # vectorised _local_moving dQ for every node against the current partition (one sparse product): the nodes
+    # with a neighbouring community worth more than eps, their best target (lowest label on ties) and its gain
+    n=len(lab); m=csr.m
+    if m==0 or n==0: return np.empty(0,np.int64),np.empty(0,np.int64),np.empty(0)
+    C=int(lab.max())+1
+    if A is None: A=_adjacency(csr)
+    K=(A@sp.csr_matrix((np.ones(n),(np.arange(n),lab)),shape=(n,C))).tocoo()
+    deg=csr.degree
+    tot=np.bincount(lab,deg,C)
+    own=K.col==lab[K.row]
+    k_own=np.zeros(n); k_own[K.row[own]]=K.data[own]; k_own-=csr.loops
+    r,c,k=K.row[~own],K.col[~own],K.data[~own]
+    dq=(k-k_own[r])/(2*m)-gamma*deg[r]*(tot[c]-tot[lab[r]]+deg[r])/(2*m*m)
+    up=dq>eps
+    r,c,dq=r[up],c[up],dq[up]
+    o=np.lexsort((c,-dq,r))
+    r,c,dq=r[o],c[o],dq[o]
+    first=np.r_[True,r[1:]!=r[:-1]] if len(r) else np.zeros(0,bool)
+    return r[first],c[first],dq[first]
+
+BATCH_MIN_SHARE = 0.05     # _batch_moving hands over to exact moves below this share of improving nodes
+
+def _batch_moving(csr,part,gamma=1.0,eps=1e-12,max_rounds=50,min_moves=None):
+    # Warm-start local moving in numpy rounds: all improving nodes move to their best community at once; if that
+    # does not raise Q, only the nodes without a neighbour heading elsewhere with a larger gain move (their shared
+    # edge is what both gains counted). Rounds stop below min_moves candidates or when neither set improves Q;
+    # the exact _queue_moving then finishes from the nodes still improving.
+    lab=np.unique(np.asarray(part),return_inverse=True)[1].ravel()
+    n=len(lab)
+    min_moves=max(1,int(n*BATCH_MIN_SHARE)) if min_moves is None else min_moves
+    rows,cols=csr.rows,csr.indices
+    A=_adjacency(csr)
+    q=_modularity_labels(csr,lab,gamma)
+    moves=0
+    for _ in range(max_rounds):
+        r,c,dq=_best_moves(csr,lab,gamma,eps,A)
+        if len(r)<min_moves: break
+        new=lab.copy(); new[r]=c
+        q_new=_modularity_labels(csr,new,gamma)
+        go=len(r)
+        if q_new<=q:
+            gain=np.zeros(n); gain[r]=dq
+            clash=(gain[rows]>0)&(gain[cols]>0)&(new[rows]!=new[cols])
+            u,v=rows[clash],cols[clash]
+            beaten=np.zeros(n,bool)
+            beaten[u[(gain[v]>gain[u])|((gain[v]==gain[u])&(v<u))]]=True
+            keep=~beaten[r]
+            new=lab.copy(); new[r[keep]]=c[keep]
+            q_new=_modularity_labels(csr,new,gamma)
+            if q_new<=q: break
+            go=int(keep.sum())
+        lab,q=new,q_new
+        moves+=go
+    trace.count("leiden.batch_moves",moves)
+    # exact moves for what is left; on dense graphs re-screening is cheaper than queueing every neighbour
+    labels=lab.tolist()
+    while True:
+        todo=_best_moves(csr,lab,gamma,eps,A)[0].tolist()
+        if not todo: break
+        labels,exact=_queue_moving(csr,labels,todo,gamma,eps,requeue=False)
+        if exact==0: break
+        moves+=exact
+        lab=np.asarray(labels)
+    return labels,moves
+
+def _queue_moving(csr,part,queue,gamma=1.0,eps=1e-12,requeue=True):
+    # Leiden's fast local moving: only queued nodes are visited, and (requeue=True) a node that moves queues its
+    # neighbours outside its new community. Same dQ and tie rule (lowest label) as _local_moving.
+    m=csr.m
+    if m==0: return part,0
+    # adjacency is sliced per visited node: a warm start visits few of them
+    ip,ix,wt=csr.indptr.tolist(),csr.indices,csr.weights
+    deg,loops=csr.degree.tolist(),csr.loops.tolist()
+    tot=defaultdict(float)
+    for i,c in enumerate(part): tot[c]+=deg[i]
+    q=deque(queue); queued=[False]*len(part)
+    for u in q: queued[u]=True
+    moves=evals=0
+    while q:
+        u=q.popleft(); queued[u]=False
+        cu=part[u]
+        nbrs=ix[ip[u]:ip[u+1]].tolist()
+        k=defaultdict(float)
+        for v,w in zip(nbrs,wt[ip[u]:ip[u+1]].tolist()): k[part[v]]+=w
+        k_own=k.pop(cu,0.0)-loops[u]
+        if not k: continue
+        evals+=len(k)
+        ku=deg[u]; base=tot[cu]-ku
+        dqs={c:(k[c]-k_own)/(2*m)-gamma*ku*(tot[c]-base)/(2*m*m) for c in sorted(k)}
+        best_dQ=max(dqs.values())
+        if best_dQ<=eps: continue
+        chosen=next(c for c,v in dqs.items() if abs(v-best_dQ)<=eps)
+        part[u]=chosen
+        tot[cu]-=ku; tot[chosen]+=ku
+        moves+=1
+        if not requeue: continue
+        for v in nbrs:
+            if not queued[v] and part[v]!=chosen: queued[v]=True; q.append(v)
+    trace.count("louvain.dq_evals",evals); trace.count("louvain.moves",moves)
+    return part,moves
+
+def louvain_phase1_verbose(G,M,gamma=1.0,eps=1e-12):
+    csr=as_csr(G)
+    nodes,deg=csr.nodes,csr.degree
+    # SKU sets and per-community SKU counters come from the inverted index, so the Jaccard tie-break is integer work
+    skus=CommunitySKUs(SKUIndex.from_incidence(M if list(M.index)==nodes else M.loc[nodes]),range(len(nodes)))
+    def _tie_tuple_P1(u, cand_cid, k_in):
+        k_out=max(deg[u]-k_in,0.0)
+        jac=skus.jaccard(u,cand_cid)
+        return (k_in,jac,-k_out,-cand_cid)
+    labels,_=_local_moving(csr,list(range(len(nodes))),gamma,eps,tie=_tie_tuple_P1,moved=skus.move)
+    return {n:labels[i] for i,n in enumerate(nodes)}
 
 def _aggregate_graph(G, part):
+    csr=as_csr(G)
     comm_nodes=defaultdict(list)
     for n,c in part.items(): comm_nodes[c].append(n)
-    H=nx.Graph()
-    for c in comm_nodes: H.add_node(c)
-    for c,members in comm_nodes.items():
-        w_self=0.0
-        for i in range(len(members)):
-            for j in range(i+1,len(members)):
-                u,v=members[i],members[j]
-                if G.has_edge(u,v): w_self+=G[u][v]['weight']
-        if w_self>0: H.add_edge(c,c,weight=w_self)
-    comm_ids=sorted(comm_nodes.keys())
-    for i in range(len(comm_ids)):
-        for j in range(i+1,len(comm_ids)):
-            c1,c2=comm_ids[i],comm_ids[j]
-            w=0.0
-            for u in comm_nodes[c1]:
-                for v in comm_nodes[c2]:
-                    if G.has_edge(u,v): w+=G[u][v]['weight']
-            if w>0: H.add_edge(c1,c2,weight=w)
+    cidx={c:i for i,c in enumerate(comm_nodes)}
+    lab=np.array([cidx[part[n]] for n in csr.nodes],dtype=np.int64)
+    a,b=lab[csr.rows[csr.upper]],lab[csr.indices[csr.upper]]
+    # one pass over the edge list, duplicates summed by the sparse accumulator
+    W=sp.coo_matrix((csr.weights[csr.upper],(np.minimum(a,b),np.maximum(a,b))),shape=(len(cidx),len(cidx))).tocsr()
+    W.sum_duplicates()
+    W=W.tocoo()
+    keep=W.data>0
+    H=CSRGraph.from_edges(list(comm_nodes),W.row[keep],W.col[keep],W.data[keep])
     return H, comm_nodes
 
-def louvain_phase2_verbose(G, part_after_p1, gamma=1.0, eps=1e-12):
-    H, comm_nodes=_aggregate_graph(G,part_after_p1)
-    nodesH=list(H.nodes())
-    partH={n:i for i,n in enumerate(nodesH)}
-    def mod_H(H,partH,gamma=1.0):
-        mH=H.size(weight='weight')
-        if mH==0: return 0.0
-        degH=dict(H.degree(weight='weight'))
-        tot=defaultdict(float)
-        intra=defaultdict(float)
-        for n,c in partH.items(): tot[c]+=degH[n]
-        for u,v,d in H.edges(data=True):
-            if partH[u]==partH[v]: intra[partH[u]]+=d.get('weight',1.0)
-        Q=0.0
-        for c in set(partH.values()):
-            Q+=(intra.get(c,0.0)/(2*mH))-gamma*(tot.get(c,0.0)**2)/(4*mH*mH)
-        return Q
-    while True:
-        moved_this_pass=0
-        for u in nodesH:
-            cu=partH[u]
-            neighbor_cids=sorted(set(partH[v] for v in H.neighbors(u))-{cu})
-            if not neighbor_cids: continue
-            baseQ=mod_H(H,partH,gamma)
-            dqs={cand:mod_H(H,{**partH,u:cand},gamma)-baseQ for cand in neighbor_cids}
-            best_dQ=max(dqs.values())
-            if best_dQ<=eps: continue
-            best_cands=[c for c,v in dqs.items() if abs(v-best_dQ)<=eps]
-            chosen=best_cands[0] if len(best_cands)==1 else min(best_cands)
-            partH[u]=chosen
-            moved_this_pass+=1
-        if moved_this_pass==0: break
-    comm_of_H=defaultdict(list)
-    for nH,cH in partH.items():
-        for orig in comm_nodes[nH]: comm_of_H[cH].append(orig)
-    part_back={}
-    for cid,members in comm_of_H.items():
-        for n in members: part_back[n]=cid
-    return part_back
+def louvain_phase2_verbose(G, part_after_p1, gamma=1.0, eps=1e-12, max_levels=None):
+    part=dict(part_after_p1)
+    H, comm_nodes=_aggregate_graph(G,part)
+    level=0
+    while max_levels is None or level<max_levels:
+        labels,moves=_local_moving(H,list(range(H.number_of_nodes())),gamma,eps)
+        if moves==0 and level>0: break
+        comm_of_H=defaultdict(list)
+        for i,cH in enumerate(labels):
+            for orig in comm_nodes[H.nodes[i]]: comm_of_H[cH].append(orig)
+        part={}
+        for cid,members in comm_of_H.items():
+            for n in members: part[n]=cid
+        level+=1
+        if moves==0: break
+        H,_=_aggregate_graph(H,{n:labels[i] for i,n in enumerate(H.nodes)})
+        comm_nodes=comm_of_H
+    return part
+
+def _refine_partition(csr,labels,gamma=1.0,eps=1e-12):
+    # Leiden refinement: inside every community start from singletons and merge each well-connected singleton into
+    # the well-connected sub-community with the best positive dQ (deterministic: first best in index order).
+    # Sub-communities only grow along intra-community edges, so every one of them is connected.
+    n=len(labels); m=csr.m
+    if m==0: return list(range(n))
+    # only intra-community edges matter here, so the Python loop walks a filtered copy of the adjacency
+    lab=np.asarray(labels)
+    same=(lab[csr.rows]==lab[csr.indices])&(csr.rows!=csr.indices)
+    rows=csr.rows[same]
+    ip=np.concatenate([[0],np.cumsum(np.bincount(rows,minlength=n))]).tolist()
+    ix,wt=csr.indices[same].tolist(),csr.weights[same].tolist()
+    kc=np.bincount(rows,csr.weights[same],n).tolist()     # weight from node i to the rest of its community
+    deg=csr.degree.tolist()
+    ctot=defaultdict(float)
+    for i,c in enumerate(labels): ctot[c]+=deg[i]
+    ref=list(range(n)); stot=list(deg); sext=list(kc); single=[True]*n
+    merges=0
+    for u in range(n):
+        if not single[u]: continue
+        c=labels[u]; ku=deg[u]
+        if kc[u]<gamma*ku*(ctot[c]-ku)/(2*m): continue
+        k=defaultdict(float)
+        for v,w in zip(ix[ip[u]:ip[u+1]],wt[ip[u]:ip[u+1]]): k[ref[v]]+=w
+        best,best_dq=None,eps
+        for s,kus in k.items():
+            if sext[s]<gamma*stot[s]*(ctot[c]-stot[s])/(2*m): continue
+            dq=kus/(2*m)-gamma*ku*stot[s]/(2*m*m)
+            if dq>best_dq: best,best_dq=s,dq
+        if best is None: continue
+        ref[u]=best; single[u]=single[best]=False
+        stot[best]+=ku; sext[best]+=kc[u]-2*k[best]
+        merges+=1
+    trace.count("leiden.refine_merges",merges)
+    return ref
+
+def _aggregate_levels(csr,labels,ref,gamma,eps,max_levels=None):
+    # Leiden levels: aggregate on the refined partition, start the aggregate from the unrefined communities,
+    # move, refine again; stops once every community is a single aggregate node. Returns one label per csr node.
+    H,members,level=csr,[[i] for i in range(len(labels))],0
+    while max_levels is None or level<max_levels:
+        if len(set(ref))==H.number_of_nodes():
+            if len(set(labels))==H.number_of_nodes(): break
+            ref=labels               # refinement merged nothing: aggregate by community as Louvain does
+        idx=H.index
+        H,groups=_aggregate_graph(H,{n:ref[i] for i,n in enumerate(H.nodes)})
+        groups=[[idx[x] for x in groups[g]] for g in H.nodes]
+        members=[[o for j in g for o in members[j]] for g in groups]
+        labels,moves=_batch_moving(H,[labels[g[0]] for g in groups],gamma,eps)
+        level+=1
+        if moves==0 and len(set(labels))==H.number_of_nodes(): break
+        ref=_refine_partition(H,labels,gamma,eps)
+    out=[0]*csr.number_of_nodes()
+    for i,ms in enumerate(members):
+        for o in ms: out[o]=labels[i]
+    return out
+
+def split_disconnected(G,part):
+    # a community whose intra-community edges do not connect all its members is split into its components; the
+    # component holding the lowest-indexed member keeps the label, the others get fresh ones
+    csr=as_csr(G)
+    n=csr.number_of_nodes()
+    lab=np.array([part[v] for v in csr.nodes],dtype=np.int64)
+    same=lab[csr.rows]==lab[csr.indices]
+    A=sp.csr_matrix((np.ones(int(same.sum())),(csr.rows[same],csr.indices[same])),shape=(n,n))
+    _,comp=connected_components(A,directed=False)
+    out=np.empty(n,dtype=np.int64)
+    label_of,owner={},{}         # component -> label, community -> the component that keeps its label
+    fresh=base=int(lab.max())+1 if n else 0
+    for i,(c,l) in enumerate(zip(comp.tolist(),lab.tolist())):
+        if c not in label_of:
+            if owner.setdefault(l,c)==c: label_of[c]=l
+            else: label_of[c]=fresh; fresh+=1
+        out[i]=label_of[c]
+    splits=fresh-base
+    trace.count("leiden.splits",splits)
+    return {v:int(out[i]) for i,v in enumerate(csr.nodes)},splits
+
+def leiden_phase2(G,part_after_p1,gamma=1.0,eps=1e-12,max_levels=None):
+    # Leiden-style continuation of louvain_phase1_verbose: refine the P1 communities into connected, well-connected
+    # sub-communities and aggregate those, so a community can no longer end up internally disconnected
+    csr=as_csr(G)
+    labels=_labels_array(csr,part_after_p1).tolist()
+    out=_aggregate_levels(csr,labels,_refine_partition(csr,labels,gamma,eps),gamma,eps,max_levels)
+    part,_=split_disconnected(csr,{v:out[i] for i,v in enumerate(csr.nodes)})
+    return part
+
+def _size_stats(sizes):
+    sizes=np.sort(np.asarray(sizes,dtype=np.int64))
+    if not len(sizes): return {}
+    return {"min":int(sizes[0]),"p25":float(np.percentile(sizes,25)),"median":float(np.median(sizes)),
+            "p75":float(np.percentile(sizes,75)),"max":int(sizes[-1]),"mean":float(sizes.mean()),
+            "singletons":int((sizes==1).sum())}
+
+def resolution_sweep(G,gammas,warm_start=True,eps=1e-12,keep_partitions=False):
+    # One clustering per gamma on a graph built once, run from high to low gamma (fine to coarse). The first gamma
+    # (every one without warm_start) is a cold Leiden run; after that each gamma starts from the previous partition:
+    # _batch_moving settles it at the order level in a few vectorised rounds, the levels above run on the small
+    # community graph, and split_disconnected keeps every cluster connected. Results come back in the order of
+    # `gammas`: gamma, modularity at that gamma and at gamma=1, cluster count, size stats, splits and wall time.
+    csr=as_csr(G)
+    n=csr.number_of_nodes()
+    results=[None]*len(gammas)
+    prev=None
+    for j in sorted(range(len(gammas)),key=lambda j:-gammas[j]):
+        gamma=gammas[j]
+        t0=time.perf_counter()
+        with trace.phase("sweep"):
+            cold=prev is None or not warm_start
+            labels,_=_batch_moving(csr,list(range(n)) if cold else prev,gamma,eps)
+            ref=_refine_partition(csr,labels,gamma,eps) if cold else labels
+            labels=_aggregate_levels(csr,labels,ref,gamma,eps)
+            part,splits=split_disconnected(csr,{v:labels[i] for i,v in enumerate(csr.nodes)})
+        prev=[part[v] for v in csr.nodes]
+        sizes=np.unique(prev,return_counts=True)[1] if n else []
+        r={"gamma":gamma,"modularity":_modularity_gamma(csr,part,gamma),"modularity_1":_modularity_gamma(csr,part),
+           "clusters":len(sizes),"sizes":_size_stats(sizes),"splits":splits,"wall_s":time.perf_counter()-t0}
+        if keep_partitions: r["part"]=part
+        trace.progress("sweep",gamma=gamma,clusters=r["clusters"],modularity=r["modularity"])
+        results[j]=r
+    return results
 
 def improve_with_lexi_tiebreak(G,M,part,eps_mod=1e-12,max_iters=5,target_size=None,min_size=None,max_size=None,
-                               penalty_lambda=1e6,allow_new_community=True,gamma=1.0):
+                               penalty_lambda=1e6,allow_new_community=True,gamma=1.0,target_lambda=1e-3):
+    csr=as_csr(G)
     cur_part=dict(part)
-    def _obj(p): return _modularity_gamma(G,p,gamma)-penalty_lambda*_violations_of(p,max_size) if max_size else _modularity_gamma(G,p,gamma)
+    nodes,idx,m=csr.nodes,csr.index,csr.m
+    ip,ix,wt=csr.indptr.tolist(),csr.indices.tolist(),csr.weights.tolist()
+    deg,loops=csr.degree.tolist(),csr.loops.tolist()
+    lab=[cur_part[n] for n in nodes]
+    size=defaultdict(int); tot=defaultdict(float)
+    for i,c in enumerate(lab): size[c]+=1; tot[c]+=deg[i]
+    def _pen(s):
+        # capacity violations are penalised by penalty_lambda per order, the target size softly by target_lambda
+        if s==0: return 0.0
+        p=0.0
+        if max_size and s>max_size: p+=penalty_lambda*(s-max_size)
+        if min_size and s<min_size: p+=penalty_lambda*(min_size-s)
+        if target_size: p+=target_lambda*abs(s-target_size)
+        return p
+    moved_this_round=evals=total_moves=0
     for it in range(1,max_iters+1):
         moved_this_round=0
         next_cid=(max(cur_part.values())+1) if cur_part else 0
         for u in list(cur_part.keys()):
-            cid_u=cur_part[u]
-            neighbor_cids=set(cur_part[v] for v in G.neighbors(u))
-            candidate_cids=sorted(neighbor_cids|{cid_u})
+            cid_u=cur_part[u]; i=idx[u]
+            k=defaultdict(float)
+            for v,w in zip(ix[ip[i]:ip[i+1]],wt[ip[i]:ip[i+1]]): k[lab[v]]+=w
+            k_own=k.pop(cid_u,0.0)-loops[i]
+            candidate_cids=sorted(set(k)|{cid_u})
             if allow_new_community: candidate_cids.append(next_cid)
-            feasible=[cid for cid in candidate_cids if (cid==cid_u) or (max_size is None or list(cur_part.values()).count(cid)<max_size)]
-            if not feasible: continue
-            objs={cid:_obj({**cur_part,u:cid}) for cid in feasible}
-            best_obj=max(objs.values())
-            best_cids=[cid for cid,v in objs.items() if abs(v-best_obj)<=eps_mod]
-            chosen=best_cids[0]
-            if chosen!=cid_u: cur_part[u]=chosen; moved_this_round+=1
+            ku=deg[i]; base=tot[cid_u]-ku; s_u=size[cid_u]
+            pen_out=_pen(s_u-1)-_pen(s_u)
+            deltas={}
+            for cid in candidate_cids:
+                if cid in deltas: continue
+                if cid==cid_u: deltas[cid]=0.0; continue
+                s_c=size.get(cid,0)
+                if max_size is not None and s_c>=max_size: continue
+                dq=((k.get(cid,0.0)-k_own)/(2*m)-gamma*ku*(tot.get(cid,0.0)-base)/(2*m*m)) if m else 0.0
+                deltas[cid]=dq-pen_out-(_pen(s_c+1)-_pen(s_c))
+            evals+=len(deltas)
+            best=max(deltas.values())
+            chosen=next(cid for cid,v in deltas.items() if abs(v-best)<=eps_mod)
+            if chosen!=cid_u:
+                cur_part[u]=chosen; lab[i]=chosen
+                size[cid_u]-=1; size[chosen]+=1
+                tot[cid_u]-=ku; tot[chosen]+=ku
+                moved_this_round+=1
+                # open a fresh community once the current one is full
+                if chosen==next_cid and max_size and size[chosen]>=max_size: next_cid+=1
+        total_moves+=moved_this_round
+        trace.progress("refine",rounds=it,moves=total_moves)
         if moved_this_round==0: break
-    final_mod=_modularity_gamma(G,cur_part,gamma)
+    trace.count("refine.rounds",it if max_iters>0 else 0); trace.count("refine.dq_evals",evals)
+    trace.count("refine.moves",total_moves)
+    final_mod=_modularity_gamma(csr,cur_part,gamma)
     return cur_part,final_mod,moved_this_round
 
-def run_pipeline_from_excel(file_path):
-    M=pd.read_excel(file_path,sheet_name="Incidence",index_col=0,engine="openpyxl")
-    G=build_order_graph(M,weight_mode="jaccard",min_weight=0.0)
-    print(f"[INFO] Graph -> nodes: {G.number_of_nodes()} edges: {G.number_of_edges()}")
-    p1=louvain_phase1_verbose(G,M)
-    p2=louvain_phase2_verbose(G,p1)
-    part_final,mod_final,nmove=improve_with_lexi_tiebreak(G,M,p2,max_iters=5)
-    print(f"[INFO] Final modularity Q={mod_final:.6f} | refinement moves={nmove}")
-    print("[INFO] Partition final:", partition_to_groups(part_final))
+def cluster_info(G,M,part,priority=None):
+    # per community: sorted members, load (SKU lines), center (member with the most weight inside the
+    # community, lowest id on ties) and the share of Express orders when a priority per order is known
+    csr=as_csr(G)
+    nodes=csr.nodes
+    lab=np.array([part[n] for n in nodes],dtype=np.int64)
+    inner=np.bincount(csr.rows,csr.weights*(lab[csr.rows]==lab[csr.indices]),minlength=len(nodes))
+    B=incidence_matrix(M)
+    load=pd.Series(np.asarray(B.sum(axis=1)).ravel(),index=M.index).reindex(nodes).fillna(0).to_numpy()
+    express=(pd.Series(priority).reindex(nodes)=="Express").to_numpy() if priority is not None else np.zeros(len(nodes))
+    df=pd.DataFrame({"node":nodes,"cid":lab,"inner":inner,"load":load,"express":express}).sort_values(["cid","node"])
+    info={}
+    for cid,g in df.groupby("cid",sort=True):
+        info[int(cid)]={"members":g["node"].tolist(),"load":float(g["load"].sum()),
+                        "center":g["node"].iloc[int(np.argmax(g["inner"].to_numpy()))],
+                        "express_ratio":float(g["express"].mean())}
+    return info
+
+def _load_graph(file_path,weight_mode="jaccard",min_weight=0.0,cache=None):
+    with trace.phase("load"):
+        M=read_incidence(file_path)
+    with trace.phase("graph"):
+        kg=cache_key(incidence_hash(M),weight_mode,min_weight) if cache else None
+        G=cache.get_graph(kg) if cache else None
+        if G is None:
+            G=CSRGraph.from_edges(*order_edges(M,weight_mode=weight_mode,min_weight=min_weight))
+            if cache: cache.put_graph(kg,G)
+    trace.info(f"[INFO] Graph -> nodes: {G.number_of_nodes()} edges: {G.number_of_edges()}",
+               nodes=G.number_of_nodes(),edges=G.number_of_edges())
+    return M,G,kg
+
+def run_pipeline_from_excel(file_path,weight_mode="jaccard",min_weight=0.0,gamma=1.0,target_size=None,min_size=None,
+                            max_size=None,max_iters=5,cache=None,method="louvain"):
+    # cache: a dlssp_cache.GraphCache (or its directory); every stage is keyed by the incidence content hash
+    # plus the parameters it depends on, so an identical rerun only reads the input and the cached arrays.
+    # method="leiden" replaces Louvain phase 2 by leiden_phase2 and splits communities the final refinement
+    # left disconnected.
+    if method not in ("louvain","leiden"):
+        raise ValueError("method must be 'louvain' or 'leiden'.")
+    if isinstance(cache,str): cache=GraphCache(cache)
+    M,G,kg=_load_graph(file_path,weight_mode,min_weight,cache)
+    def _stage(name,key,fn):
+        with trace.phase(name):
+            hit=cache.get_partition(key,G.nodes) if cache else None
+            if hit is not None: return hit
+            part,info=fn()
+            if cache: cache.put_partition(key,G.nodes,part,**info)
+            return part,info
+    leiden=method=="leiden"
+    k1=cache_key(kg,"p1",gamma); k2=cache_key(k1,"leiden" if leiden else "p2",gamma)
+    k3=cache_key(k2,"final",gamma,target_size,min_size,max_size,max_iters)
+    p1,_=_stage("louvain_p1",k1,lambda:(louvain_phase1_verbose(G,M,gamma),{}))
+    p2,_=_stage("leiden_p2" if leiden else "louvain_p2",k2,
+                lambda:((leiden_phase2 if leiden else louvain_phase2_verbose)(G,p1,gamma),{}))
+    def _final():
+        part,mod,nmove=improve_with_lexi_tiebreak(G,M,p2,max_iters=max_iters,target_size=target_size,
+                                                 min_size=min_size,max_size=max_size,gamma=gamma)
+        if leiden:
+            part,splits=split_disconnected(G,part)
+            if splits: mod=_modularity_gamma(G,part,gamma)
+        return part,{"modularity":mod,"moves":nmove}
+    part_final,info=_stage("refine",k3,_final)
+    trace.info(f"[INFO] Final modularity Q={info['modularity']:.6f} | refinement moves={info['moves']}",
+               modularity=info['modularity'],moves=info['moves'])
+    groups=partition_to_groups(part_final)
+    trace.info(f"[INFO] Partition final: {len(groups)} clusters, largest {max(map(len,groups.values()),default=0)}",
+               clusters=len(groups))
+    # order priorities for the cluster summary, when the workbook has an Orders sheet with them
+    priority=None
+    if str(file_path).lower().endswith((".xlsx",".xlsm",".xls")):
+        try:
+            orders=pd.read_excel(file_path,sheet_name="Orders",index_col=0)
+            if "priority" in orders: priority=orders["priority"]
+        except ValueError:
+            pass
+    return {"G":G,"M":M,"p1_part":p1,"p2_part":p2,"part_final":part_final,"groups_final":groups,
+            "modularity":info["modularity"],"moves":info["moves"],"cluster_info":cluster_info(G,M,part_final,priority)}
+
+def resolution_sweep_from_excel(file_path,gammas,weight_mode="jaccard",min_weight=0.0,warm_start=True,cache=None,
+                                keep_partitions=False):
+    # the input is read and the graph built (or taken from the cache) once for the whole sweep
+    if isinstance(cache,str): cache=GraphCache(cache)
+    _,G,_=_load_graph(file_path,weight_mode,min_weight,cache)
+    results=resolution_sweep(G,gammas,warm_start=warm_start,keep_partitions=keep_partitions)
+    for r in results:
+        trace.info(f"[INFO] gamma={r['gamma']:g} Q={r['modularity']:.6f} clusters={r['clusters']} "
+                   f"size median={r['sizes'].get('median',0):g} max={r['sizes'].get('max',0)}",
+                   gamma=r['gamma'],modularity=r['modularity'],clusters=r['clusters'])
+    return results
 
 def run_dlssp_example():
     df_incidence=pd.DataFrame({"sku1":[1,0,1],"sku2":[0,1,1],"sku3":[1,1,0]},index=["order1","order2","order3"])
@@ -200,8 +511,7 @@ def run_dlssp_example():
     with pd.ExcelWriter(path,engine="xlsxwriter") as w:
         df_incidence.to_excel(w,sheet_name="Incidence")
         df_orders.to_excel(w,sheet_name="Orders")
-    run_pipeline_from_excel(path)
-    return path
+    return run_pipeline_from_excel(path)
 
 if __name__=="__main__":
     run_dlssp_example()
@@ -1,7 +1,18 @@
-import pandas as pd
+import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dlssp_io import read_table
+from dlssp_lanes import LaneLayout, assign_lane_indices, lane_layout
+from dlssp_orders import OrderStore
+from dlssp_sim import simulate
+import dlssp_trace as trace
+
+ORDER_SCHEMA = {'OrderID': 'label', 'SKU': 'label', 'Wave': 'number', 'ReleaseTime': 'number', 'PackingTime': 'number'}
 
 class Order:
+    __slots__ = ('order_id', 'sku', 'wave', 'release_time', 'packing_time', 'lane', 'start_time', 'completion_time',
+                 'travel_time', 'wait_time', 'sla_violation', 'tardiness')
+
     def __init__(self, order_id, sku, wave, release_time, packing_time, lane=None):
         self.order_id = order_id
         self.sku = sku
@@ -17,72 +28,161 @@ class Order:
         self.tardiness = 0
 
 class Lane:
+    __slots__ = ('lane_id', 'speed', 'assigned_orders')
+
     def __init__(self, lane_id, speed=1.0):
         self.lane_id = lane_id
         self.speed = speed
         self.assigned_orders = []
 
-def load_orders_from_excel(file_path):
-    df = pd.read_excel(file_path)
-    orders = []
-    for _, row in df.iterrows():
-        orders.append(Order(
-            order_id=row['OrderID'],
-            sku=row['SKU'],
-            wave=row['Wave'],
-            release_time=row['ReleaseTime'],
-            packing_time=row['PackingTime']
-        ))
-    return orders
+def load_orders_from_excel(file_path, columnar=False):
+    # columnar=True gives an OrderStore (structured array + label codes) instead of one Order object per row
+    df = read_table(file_path, ORDER_SCHEMA)
+    if columnar:
+        return OrderStore.from_frame(df)
+    return [Order(*row) for row in zip(*(df[c].tolist() for c in ORDER_SCHEMA))]
 
-def assign_lanes(orders, lanes):
-    lane_load = defaultdict(float)
-    for order in sorted(orders, key=lambda x: x.release_time):
-        lane = min(lanes, key=lambda l: lane_load[l.lane_id])
-        order.lane = lane.lane_id
-        lane.assigned_orders.append(order)
-        lane_load[lane.lane_id] += order.packing_time
+def assign_lanes(orders, lanes, mode="greedy"):
+    # packing time is the lane work; see dlssp_lanes for the greedy / lpt heaps
+    layout = LaneLayout([l.lane_id for l in lanes], [0.0] * len(lanes), [l.speed for l in lanes])
+    if isinstance(orders, OrderStore):
+        seq = np.argsort(orders.data['release_time'], kind='stable').tolist()
+        idx = assign_lane_indices(orders.data['packing_time'], layout, mode, order=seq)
+        for i in seq:
+            lanes[idx[i]].assigned_orders.append(i)   # store rows, not objects
+        orders.set_labels('lane', [lanes[i].lane_id for i in idx])
+        return orders
+    seq = sorted(range(len(orders)), key=lambda i: orders[i].release_time)
+    idx = assign_lane_indices([o.packing_time for o in orders], layout, mode, order=seq)
+    for i in seq:
+        lane = lanes[idx[i]]
+        orders[i].lane = lane.lane_id
+        lane.assigned_orders.append(orders[i])
     return orders
 
-def schedule_orders(orders, sorter_speed=1.0, max_utilization=0.85):
-    waves = sorted(set(o.wave for o in orders))
-    current_time = 0
+SEQUENCE_MODES = ("input", "edd", "tardiness")
+SWAP_PASSES = 5
+
+def _lane_tardiness(seq, release, duration, entry):
+    t, total = entry, 0.0
+    for i in seq:
+        t += duration[i]
+        total += max(0.0, t - (release[i] + 10))
+    return total
+
+def _sequence_wave(job):
+    # order of one wave's orders: input order, EDD per lane, or EDD improved by adjacent swaps on lane tardiness.
+    # Waves only meet through lane end times, and those do not depend on the order inside a wave, so every
+    # wave can be sequenced on its own once the lane entry times are known.
+    lane, release, duration, entry, mode = job
+    if mode == "input":
+        return list(range(len(lane)))
+    per_lane = defaultdict(list)
+    for i, l in enumerate(lane):
+        per_lane[l].append(i)
+    for l, seq in per_lane.items():
+        seq.sort(key=lambda i: release[i])
+        if mode != "tardiness": continue
+        for _ in range(SWAP_PASSES):
+            improved = False
+            t = entry[l]
+            for k in range(len(seq) - 1):
+                a, b = seq[k], seq[k + 1]
+                if _lane_tardiness((b, a), release, duration, t) < _lane_tardiness((a, b), release, duration, t):
+                    seq[k], seq[k + 1] = b, a
+                    improved = True
+                t += duration[seq[k]]
+            if not improved: break
+    # lanes are independent, so interleave them back in the input order of lane slots
+    slots = {l: iter(seq) for l, seq in per_lane.items()}
+    return [next(slots[l]) for l in lane]
+
+def _column(orders, name):
+    return orders.column(name).tolist() if isinstance(orders, OrderStore) else [getattr(o, name) for o in orders]
+
+def schedule_orders(orders, sorter_speed=1.0, max_utilization=0.85, trays=8, return_sim=False, sequence="input",
+                    workers=None):
+    # works on plain column lists, so a list of Order objects and an OrderStore go through the same loop
+    if sequence not in SEQUENCE_MODES:
+        raise ValueError(f"sequence must be one of {SEQUENCE_MODES}.")
+    lane_of, release = _column(orders, 'lane'), _column(orders, 'release_time')
+    packing = _column(orders, 'packing_time')
+    by_wave = defaultdict(list)
+    for i, w in enumerate(_column(orders, 'wave')):
+        by_wave[w].append(i)
+    waves = sorted(by_wave)
+    travel = 1.0 / sorter_speed
+    if sequence != "input":
+        # lane entry time of every wave from per-lane work totals, then each wave is sequenced independently
+        lane_end, jobs = defaultdict(float), []
+        for wave in waves:
+            idx = by_wave[wave]
+            wave_start = min(release[i] for i in idx)
+            work = defaultdict(float)
+            for i in idx:
+                work[lane_of[i]] += travel + packing[i]
+            entry = {l: max(wave_start, lane_end[l]) for l in work}
+            for l, w in work.items():
+                lane_end[l] = entry[l] + w
+            jobs.append(([lane_of[i] for i in idx], [release[i] for i in idx],
+                         [travel + packing[i] for i in idx], entry, sequence))
+        if workers and workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                perms = list(ex.map(_sequence_wave, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+        else:
+            perms = [_sequence_wave(job) for job in jobs]
+        for wave, perm in zip(waves, perms):
+            by_wave[wave] = [by_wave[wave][i] for i in perm]
     lane_end_time = defaultdict(float)
+    n = len(lane_of)
+    start, completion = [0] * n, [0] * n
 
     for wave in waves:
-        wave_orders = [o for o in orders if o.wave == wave]
-        wave_start = min(o.release_time for o in wave_orders)
-        for order in wave_orders:
-            lane = order.lane
-            start = max(wave_start, lane_end_time[lane])
-            order.travel_time = 1.0 / sorter_speed
-            order.start_time = start
-            order.completion_time = start + order.travel_time + order.packing_time
-            order.wait_time = start - order.release_time
-            lane_end_time[lane] = order.completion_time
-            order.sla_violation = order.completion_time > order.release_time + 10
-            order.tardiness = max(0, order.completion_time - (order.release_time + 10))
-            utilization = sum(o.packing_time for o in orders if o.start_time <= current_time < o.completion_time)
-            if utilization > max_utilization:
-                print(f"Warning: sorter utilization exceeded at time {current_time}")
-    return orders
+        idx = by_wave[wave]
+        wave_start = min(release[i] for i in idx)
+        for i in idx:
+            lane = lane_of[i]
+            start[i] = max(wave_start, lane_end_time[lane])
+            completion[i] = lane_end_time[lane] = start[i] + travel + packing[i]
+    wait = [s - r for s, r in zip(start, release)]
+    sla = [c > r + 10 for c, r in zip(completion, release)]
+    tardiness = [max(0, c - (r + 10)) for c, r in zip(completion, release)]
+    state = {'travel_time': [travel] * n, 'start_time': start, 'completion_time': completion, 'wait_time': wait,
+             'sla_violation': sla, 'tardiness': tardiness}
+    if isinstance(orders, OrderStore):
+        for name, col in state.items():
+            orders.data[name] = col
+    else:
+        for i, o in enumerate(orders):
+            o.travel_time, o.start_time, o.completion_time = travel, start[i], completion[i]
+            o.wait_time, o.sla_violation, o.tardiness = wait[i], sla[i], tardiness[i]
+    # tray utilisation over time from the event simulator instead of re-summing every order per order
+    sim = simulate(lane_of, start, [0] * n, state['travel_time'], packing, trays, max_utilization)
+    for t_from, t_to, i in sim.gridlock:
+        trace.warn("utilization", f"sorter utilization exceeded at time {t_from}", t_from=t_from, t_to=t_to)
+    trace.flush_warnings()
+    return (orders, sim) if return_sim else orders
 
-def run_pipeline_from_excel(file_path):
-    lanes = [Lane(lane_id=i+1, speed=1.0) for i in range(3)]
-    orders = load_orders_from_excel(file_path)
-    orders = assign_lanes(orders, lanes)
-    orders = schedule_orders(orders)
-    results = []
-    for o in orders:
-        results.append({
-            "OrderID": o.order_id,
-            "Wave": o.wave,
-            "Lane": o.lane,
-            "Start": round(o.start_time, 2),
-            "Completion": round(o.completion_time, 2),
-            "Travel": round(o.travel_time, 2),
-            "Wait": round(o.wait_time, 2),
-            "SLA_violation": o.sla_violation,
-            "Tardiness": round(o.tardiness, 2)
-        })
-    return results
+def run_pipeline_from_excel(file_path, lanes_file=None, lane_mode="greedy", sequence="input", workers=None,
+                            columnar=True):
+    layout = lane_layout(lanes_file=lanes_file)
+    lanes = [Lane(lane_id=l, speed=s) for l, s in zip(layout.ids, layout.speed.tolist())]
+    with trace.phase("load"):
+        orders = load_orders_from_excel(file_path, columnar=columnar)
+    with trace.phase("lanes"):
+        orders = assign_lanes(orders, lanes, lane_mode)
+    with trace.phase("schedule"):
+        orders = schedule_orders(orders, sequence=sequence, workers=workers)
+    cols = [_column(orders, f) for f in ('order_id', 'wave', 'lane', 'start_time', 'completion_time', 'travel_time',
+                                         'wait_time', 'sla_violation', 'tardiness')]
+    return [{
+        "OrderID": oid,
+        "Wave": wave,
+        "Lane": lane,
+        "Start": round(start, 2),
+        "Completion": round(done, 2),
+        "Travel": round(travel, 2),
+        "Wait": round(wait, 2),
+        "SLA_violation": sla,
+        "Tardiness": round(tardiness, 2)
+    } for oid, wave, lane, start, done, travel, wait, sla, tardiness in zip(*cols)]
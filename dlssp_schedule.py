@@ -0,0 +1,209 @@
+import numpy as np
+
+US_PER_MIN = 60_000_000
+NO_CAP = np.iinfo(np.int64).max // 4
+
+def to_us(minutes):
+    # same microsecond rounding as timedelta(minutes=...), so integer sums reproduce timedelta arithmetic exactly
+    frac, whole = np.modf(np.asarray(minutes, dtype=np.float64))
+    return whole.astype(np.int64) * US_PER_MIN + np.rint(frac * US_PER_MIN).astype(np.int64)
+
+def prev_wave_min(wave, release):
+    # earliest release of wave w-1 for every order of wave w (NaN for the first wave or a missing predecessor)
+    wave = np.asarray(wave)
+    release = np.asarray(release, dtype=np.float64)
+    if len(wave) == 0:
+        return release
+    waves, inv = np.unique(wave, return_inverse=True)
+    wmin = np.full(len(waves), np.inf)
+    np.minimum.at(wmin, inv, release)
+    pos = np.minimum(np.searchsorted(waves, wave - 1), len(waves) - 1)
+    found = (waves[pos] == wave - 1) & (wave > 1)
+    return np.where(found, wmin[pos], np.nan)
+
+def to_timedelta64(us):
+    return np.asarray(us, dtype=np.int64).astype("timedelta64[us]")
+
+def decode_chains(lane, release, duration, cap, sequence=None, ready=None):
+    # Each order maps its lane predecessor's completion x to min(max(x, release), cap) + duration. These maps
+    # compose in closed form (shift, lo, hi), so every lane chain is a segmented prefix scan in log2(len) steps.
+    # ready (per order) is the completion of a fixed predecessor, taken by whichever order heads its lane.
+    release, duration, cap = (np.asarray(a, dtype=np.int64) for a in (release, duration, cap))
+    n = len(release)
+    if sequence is None:
+        sequence = np.argsort(release, kind="stable")
+    codes = np.unique(np.asarray(lane), return_inverse=True)[1].ravel()
+    sequence = np.asarray(sequence, dtype=np.int64)
+    idx = sequence[np.argsort(codes[sequence], kind="stable")]
+    shift = duration[idx].copy()
+    lo = np.minimum(release[idx], cap[idx]) + shift
+    hi = cap[idx] + shift
+    c = codes[idx]
+    first = np.r_[True, c[1:] != c[:-1]] if n else np.zeros(0, dtype=bool)
+    if ready is not None:
+        r = release[idx]
+        lo[first] = np.minimum(np.maximum(r[first], np.asarray(ready, dtype=np.int64)[idx][first]),
+                               cap[idx][first]) + shift[first]
+    head = np.maximum.accumulate(np.where(first, np.arange(n), 0)) if n else c
+    pos = np.arange(n) - head
+    step = 1
+    while n and step <= pos.max():
+        j = np.nonzero(pos >= step)[0]
+        f = j - step
+        s_g, lo_g, hi_g = shift[j], lo[j], hi[j]
+        new_shift = shift[f] + s_g
+        new_lo = np.clip(lo[f] + s_g, lo_g, hi_g)
+        new_hi = np.clip(hi[f] + s_g, lo_g, hi_g)
+        shift[j], lo[j], hi[j] = new_shift, new_lo, new_hi
+        step *= 2
+    completion = np.empty(n, dtype=np.int64)
+    completion[idx] = lo
+    return completion - duration, completion
+
+class ScheduleState:
+    # Per-lane order chains: start = min(max(prev completion, release), cap), completion = start + duration.
+    # Orders on different lanes never interact, so a solution is the order sequence of every lane and a move
+    # only re-times the suffix of the lanes it touches. All times are integer microseconds from the origin.
+    def __init__(self, lane, release, duration, cap, sla, sequence=None, ready=None):
+        # ready: {lane: completion of a fixed predecessor} for lanes that continue an earlier chain
+        self.lane = list(lane)
+        self.release = [int(x) for x in release]
+        self.duration = [int(x) for x in duration]
+        self.cap = [int(x) for x in cap]
+        self.sla = [int(x) for x in sla]
+        self.ready = dict(ready or {})
+        n = len(self.lane)
+        self.start = [0] * n
+        self.completion = [0] * n
+        self.tardiness = [0] * n
+        self.total_tardiness = 0
+        if sequence is None:
+            sequence = np.argsort(np.asarray(self.release), kind="stable").tolist()
+        self.lanes = {}
+        for i in sequence:
+            self.lanes.setdefault(self.lane[i], []).append(i)
+        self.peak = {}
+        self._saved = None
+        for l in self.lanes:
+            self._retime(l, 0)
+
+    def _retime(self, l, p):
+        # peak[l][k]: latest completion among the lane's first k + 1 orders, so the lane maximum is re-derived from
+        # the untouched prefix and the re-timed suffix only
+        seq, peak = self.lanes[l], self.peak.setdefault(l, [])
+        del peak[p:]
+        top = peak[-1] if peak else None
+        prev = self.completion[seq[p - 1]] if p > 0 else self.ready.get(l)
+        for i in seq[p:]:
+            s = self.release[i] if prev is None or prev < self.release[i] else prev
+            if s > self.cap[i]: s = self.cap[i]
+            prev = s + self.duration[i]
+            t = prev - self.sla[i]
+            if t < 0: t = 0
+            self.total_tardiness += t - self.tardiness[i]
+            self.start[i], self.completion[i], self.tardiness[i] = s, prev, t
+            if top is None or prev > top: top = prev
+            peak.append(top)
+
+    def _touch(self, l, p):
+        # keeps the lane's sequence and the first position a move changed: the chain before it is untouched, so a
+        # rollback re-times the lane from there instead of saving every order's times
+        if self._saved is not None:
+            saved = self._saved.setdefault(l, [list(self.lanes[l]), p])
+            saved[1] = min(saved[1], p)
+
+    def checkpoint(self):
+        self._saved = {}
+
+    def commit(self):
+        self._saved = None
+
+    def rollback(self):
+        for l, (seq, p) in self._saved.items():
+            for i in self.lanes[l][p:]:
+                self.total_tardiness -= self.tardiness[i]
+                self.tardiness[i] = 0
+            self.lanes[l] = seq
+            self._retime(l, p)
+        self._saved = None
+
+    def remove(self, orders):
+        dirty = {}
+        for i in orders:
+            l = self.lane[i]
+            seq = self.lanes[l]
+            p = seq.index(i)
+            self._touch(l, p)
+            del seq[p]
+            dirty[l] = min(dirty.get(l, p), p)
+            self.total_tardiness -= self.tardiness[i]
+            self.tardiness[i] = 0
+        for l, p in dirty.items():
+            self._retime(l, p)
+
+    def insert(self, i, pos):
+        l = self.lane[i]
+        self._touch(l, pos)
+        self.lanes[l].insert(pos, i)
+        self._retime(l, pos)
+
+    def lane_length(self, i):
+        return len(self.lanes[self.lane[i]])
+
+    def cmax(self):
+        return max((peak[-1] for peak in self.peak.values() if peak), default=0)
+
+    def sequence(self):
+        return {l: list(seq) for l, seq in self.lanes.items()}
+
+    def insertion_delta(self, i, pos):
+        # (extra tardiness, latest completion touched) of inserting i at pos, without changing the state; once a
+        # successor's completion is unchanged the rest of the lane is too, so the walk stops there
+        seq = self.lanes[self.lane[i]]
+        prev = self.completion[seq[pos - 1]] if pos > 0 else self.ready.get(self.lane[i])
+        extra, latest = 0, None
+        for j in [i] + seq[pos:]:
+            s = self.release[j] if prev is None or prev < self.release[j] else prev
+            if s > self.cap[j]: s = self.cap[j]
+            c = s + self.duration[j]
+            if j != i:
+                if c == self.completion[j]: break
+                extra -= self.tardiness[j]
+            extra += max(c - self.sla[j], 0)
+            latest = c if latest is None or c > latest else latest
+            prev = c
+        return extra, latest
+
+class ObjectiveEvaluator:
+    # total = lambda3*makespan + lambda2*lane imbalance + lambda1*SLA overrun + tardiness, all in minutes. The
+    # makespan runs from the earliest release, so small improvements are not lost next to an epoch timestamp.
+    # Lane loads are fixed by the lane assignment, so the imbalance term is a constant of the instance.
+    def __init__(self, params, release, sla, lane_imbalance=0.0):
+        self.lambda1 = float(params.get('lambda1', 1e6))
+        self.lambda2 = float(params.get('lambda2', 1000))
+        self.lambda3 = float(params.get('lambda3', 1))
+        self.release0 = int(np.min(release)) if len(release) else 0
+        self.sla = np.asarray(sla, dtype=np.int64)
+        self.lane_imbalance = float(lane_imbalance)
+
+    def combine(self, cmax, tardiness):
+        makespan = (cmax - self.release0) / US_PER_MIN
+        tardiness = tardiness / US_PER_MIN
+        components = {'makespan': makespan, 'lane_imbalance': self.lane_imbalance, 'sla_penalty': tardiness,
+                      'tardiness': tardiness}
+        total = (self.lambda3 * makespan + self.lambda2 * self.lane_imbalance + self.lambda1 * tardiness
+                 + tardiness)
+        return total, components
+
+    def evaluate(self, completion):
+        completion = np.asarray(completion, dtype=np.int64)
+        if not len(completion):
+            return self.combine(self.release0, 0)
+        return self.combine(int(completion.max()), int(np.maximum(completion - self.sla, 0).sum()))
+
+    def insertion_cost(self, extra_tardiness, latest, cmax):
+        return self.lambda3 * max(latest - cmax, 0) / US_PER_MIN + (self.lambda1 + 1) * extra_tardiness / US_PER_MIN
+
+    def score(self, state):
+        # the state keeps makespan and tardiness current, so a score is two lookups, never a pass over the orders
+        return self.combine(state.cmax(), state.total_tardiness)[0]
@@ -0,0 +1,67 @@
+import heapq
+from collections import deque, namedtuple
+import numpy as np
+
+# Discrete-event model of the loop sorter. An order takes a tray at induction, rides the loop to its lane
+# (travel), is discharged there (tray freed) and then waits for its lane, which packs one order at a time.
+# Ut(t) = occupied trays / trays. With block=True an induction waits for a free tray; otherwise the planned
+# induction times are kept and Ut may exceed 1, which is how a schedule is checked before it goes to the floor.
+# Every event goes through one heap, so a run is O(n log n).
+
+SimResult = namedtuple("SimResult", ["induct", "discharge", "done", "tray_wait", "ut_at_induct", "times", "ut",
+                                     "peak", "gridlock", "trays", "umax"])
+
+DISCHARGE, INDUCT = 0, 1   # at equal times trays are freed before they are taken
+
+def simulate(lane, start, induction, travel, service, trays, umax=1.0, block=False):
+    lane = list(lane)
+    start, induction, travel, service = ([x.item() if hasattr(x, 'item') else x for x in a]
+                                         for a in (start, induction, travel, service))
+    n = len(lane)
+    induct, discharge, done = [None] * n, [None] * n, [None] * n
+    ut_at_induct = [0.0] * n
+    events = [(start[i], INDUCT, i) for i in range(n)]
+    heapq.heapify(events)
+    waiting = deque()
+    lane_free = {}
+    busy = 0
+    times, occupied = [], []
+    gridlock, open_since = [], None
+
+    def take(i, t):
+        nonlocal busy
+        busy += 1
+        induct[i] = t
+        ut_at_induct[i] = busy / trays
+        heapq.heappush(events, (t + induction[i] + travel[i], DISCHARGE, i))
+
+    while events:
+        # settle every event at time t, then sample Ut once
+        t, last = events[0][0], None
+        while events and events[0][0] == t:
+            _, kind, i = heapq.heappop(events)
+            if kind == DISCHARGE:
+                busy -= 1
+                discharge[i] = t
+                s = max(t, lane_free.get(lane[i], t))
+                lane_free[lane[i]] = done[i] = s + service[i]
+                if not waiting: continue
+                i = waiting.popleft()
+            elif block and busy >= trays:
+                waiting.append(i)
+                continue
+            take(i, t)
+            last = i
+        times.append(t); occupied.append(busy)
+        over = busy / trays > umax
+        if over and open_since is None:
+            open_since = (t, last)
+        elif not over and open_since is not None:
+            gridlock.append((open_since[0], t, open_since[1]))
+            open_since = None
+    if open_since is not None:
+        gridlock.append((open_since[0], times[-1], open_since[1]))
+    tray_wait = [a - s for a, s in zip(induct, start)]
+    ut = np.asarray(occupied, dtype=np.float64) / trays
+    return SimResult(induct, discharge, done, tray_wait, ut_at_induct, times, ut, float(ut.max(initial=0.0)),
+                     gridlock, trays, umax)
@@ -0,0 +1,189 @@
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Phase timers, counters and rate-limited warnings for the pipelines. Disabled (the default) phase() hands back
+# one shared null context and count() returns at once, so the hooks can stay in the hot paths. enable() installs
+# a Recorder: per-phase calls / total / max wall time (and tracemalloc peak with memory=True), counters, and
+# structured events written as JSON lines on disable(). profile=True (or a .prof path) runs cProfile meanwhile.
+# Setting DLSSP_TRACE=<file.jsonl> enables it for the whole process. A listener(kind, fields) passed to enable()
+# sees phase starts / ends and progress() reports as they happen (dlssp_jobs streams them to the GUI, and may
+# raise from it to cancel a run).
+#
+# Warnings are rate limited whether or not a recorder is on: WARN_BURST per kind, then one per WARN_INTERVAL
+# seconds; flush_warnings() reports how many were held back and starts the next run with a fresh burst.
+
+WARN_BURST = 5
+WARN_INTERVAL = 1.0
+MAX_EVENTS = 100_000
+PROFILE_TOP = 30
+
+_NULL = nullcontext()
+_rec = None
+_warned = {}           # kind -> [printed, suppressed, last print time]
+
+class Recorder:
+    def __init__(self, path=None, profile=False, memory=False, listener=None):
+        self.path = path
+        self.listener = listener
+        self.t0 = time.perf_counter()
+        self.timers = {}
+        self.counters = defaultdict(int)
+        self.events = []
+        self.dropped = 0
+        self.profile_path = profile if isinstance(profile, str) else None
+        self.profiler = cProfile.Profile() if profile else None
+        self.memory = memory and not tracemalloc.is_tracing()
+        self._peaks = []
+
+    def event(self, event, **fields):
+        if len(self.events) >= MAX_EVENTS:
+            self.dropped += 1
+            return
+        self.events.append({'t': round(time.perf_counter() - self.t0, 6), 'event': event, **fields})
+
+    @contextmanager
+    def phase(self, name, event=True):
+        if self.memory:
+            # peaks nest: an inner phase's peak also counts towards the phases around it
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        if event and self.listener:
+            self.listener('phase', {'phase': name, 'state': 'start'})
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t
+            timer = self.timers.setdefault(name, {'calls': 0, 'total_s': 0.0, 'max_s': 0.0})
+            timer['calls'] += 1
+            timer['total_s'] += dt
+            timer['max_s'] = max(timer['max_s'], dt)
+            fields = {'phase': name, 'wall_s': round(dt, 6)}
+            if self.memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+                timer['peak_mb'] = max(timer.get('peak_mb', 0.0), peak / 2 ** 20)
+                fields['peak_mb'] = round(peak / 2 ** 20, 3)
+            if event:
+                self.event('phase', **fields)
+        if event and self.listener:
+            self.listener('phase', dict(fields, state='end'))
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        if self.profiler:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler:
+            self.profiler.disable()
+            if self.profile_path:
+                self.profiler.dump_stats(self.profile_path)
+        if self.memory:
+            tracemalloc.stop()
+
+    def profile_rows(self):
+        if not self.profiler:
+            return []
+        st = pstats.Stats(self.profiler)
+        rows = sorted(st.stats.items(), key=lambda kv: -kv[1][3])[:PROFILE_TOP]
+        return [{'func': f"{os.path.basename(f)}:{line}:{fn}", 'calls': nc, 'tot_s': round(tt, 6),
+                 'cum_s': round(ct, 6)} for (f, line, fn), (cc, nc, tt, ct, _) in rows]
+
+    def summary(self):
+        return {'wall_s': time.perf_counter() - self.t0, 'timers': self.timers, 'counters': dict(self.counters),
+                'events_dropped': self.dropped}
+
+    def write(self, path=None):
+        # one JSON object per line: the events in order, then one line per timer, counter and profile row
+        path = path or self.path
+        with open(path, 'a') as f:
+            for e in self.events:
+                f.write(json.dumps(e, default=str) + "\n")
+            for name, timer in self.timers.items():
+                f.write(json.dumps({'event': 'timer', 'phase': name, **timer}) + "\n")
+            for name, n in self.counters.items():
+                f.write(json.dumps({'event': 'counter', 'name': name, 'value': n}) + "\n")
+            for row in self.profile_rows():
+                f.write(json.dumps({'event': 'profile', **row}) + "\n")
+            f.write(json.dumps({'event': 'summary', 'wall_s': round(time.perf_counter() - self.t0, 6),
+                                'events_dropped': self.dropped}) + "\n")
+
+def enabled():
+    return _rec is not None
+
+def recorder():
+    return _rec
+
+def enable(path=None, profile=False, memory=False, listener=None):
+    global _rec
+    if _rec is not None:
+        disable()
+    _rec = Recorder(path, profile, memory, listener)
+    _rec.start()
+    return _rec
+
+def disable():
+    # stops the recorder, writes it to its path if it has one, and returns it for inspection
+    global _rec
+    rec, _rec = _rec, None
+    if rec is not None:
+        rec.stop()
+        if rec.path:
+            rec.write()
+    return rec
+
+def phase(name, event=True):
+    return _NULL if _rec is None else _rec.phase(name, event)
+
+def count(name, n=1):
+    if _rec is not None:
+        _rec.counters[name] += n
+
+def progress(kind, **fields):
+    if _rec is not None and _rec.listener is not None:
+        _rec.listener(kind, fields)
+
+def info(message, **fields):
+    print(message)
+    if _rec is not None:
+        _rec.event('info', message=message, **fields)
+
+def warn(kind, message, **fields):
+    state = _warned.setdefault(kind, [0, 0, 0.0])
+    now = time.monotonic()
+    if state[0] >= WARN_BURST and now - state[2] < WARN_INTERVAL:
+        state[1] += 1
+        if _rec is not None:
+            _rec.counters[f"warn.{kind}.suppressed"] += 1
+        return
+    held, state[1] = state[1], 0
+    state[0] += 1
+    state[2] = now
+    print(f"Warning: {message}" + (f" (+{held} similar suppressed)" if held else ""))
+    if _rec is not None:
+        _rec.counters[f"warn.{kind}"] += 1
+        _rec.event('warning', kind=kind, message=message, suppressed=held, **fields)
+
+def flush_warnings():
+    for kind, (printed, held, _) in _warned.items():
+        if held:
+            print(f"Warning: {held} more '{kind}' warnings suppressed")
+    _warned.clear()
+
+if os.environ.get('DLSSP_TRACE'):
+    enable(os.environ['DLSSP_TRACE'], profile=os.environ.get('DLSSP_PROFILE') or False,
+           memory=bool(os.environ.get('DLSSP_TRACE_MEMORY')))
+    atexit.register(disable)
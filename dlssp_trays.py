@@ -0,0 +1,173 @@
+import math
+import zlib
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# SKU -> tray slot placement on the loop. Slot k sits at k * spacing, in the coordinates lane positions use, and
+# the decoders charge a line quantity / lane speed * |lane_pos - slot_pos| of travel. So a SKU's cost at slot k is
+# linear in its lane demand: travel[s, k] = sum_l W[s, l] * D[l, k] over a precomputed lane x slot distance
+# matrix, plus cluster_weight * demand * the distance to its order cluster's anchor slot (so one cluster's SKUs
+# sit together). Greedy: clusters by demand, inside a cluster the SKU that co-occurs most with the ones already
+# placed goes next, each into its cheapest slot with room. Then 2-opt over the assignment: the best exchange of two
+# SKUs between slots (or move into free room) until none gains. Costs are per SKU, so the best exchange between
+# slots a and b splits into a best SKU of a and a best SKU of b, and one step only rescans the two slots touched.
+# Everything derives from the data (ties by index, no randomness), so runs are reproducible.
+
+TRAY_SLOTS = 30
+TrayPlacement = namedtuple("TrayPlacement", ["skus", "slot", "positions", "cost", "initial_cost", "moves"])
+
+def sku_hash(sku):
+    # stable across interpreter runs, unlike hash() on strings
+    return zlib.crc32(str(sku).encode())
+
+def hashed_slot(sku, n_slots=TRAY_SLOTS):
+    return sku_hash(sku) % n_slots
+
+def slot_distances(lane_pos, n_slots=TRAY_SLOTS, spacing=1.0):
+    # D[l, k]: distance from lane l to slot k along the loop
+    return np.abs(np.asarray(lane_pos, dtype=np.float64)[:, None] - np.arange(n_slots) * spacing)
+
+def sku_lane_demand(orders_df, lanes):
+    # W[s, l]: quantity / lane speed summed over the lines of SKU s discharged at lane l
+    sku_codes, skus = pd.factorize(orders_df['SKU'], sort=True)
+    lane_idx = pd.Index(lanes).get_indexer(orders_df['Lane'])
+    if (lane_idx < 0).any():
+        raise ValueError("orders use lanes that are not in the lane layout.")
+    speed = orders_df['LaneSpeed'].to_numpy(dtype=np.float64) if 'LaneSpeed' in orders_df else 1.0
+    w = orders_df['Quantity'].to_numpy(dtype=np.float64) / speed
+    W = sp.csr_matrix((w, (sku_codes, lane_idx)), shape=(len(skus), len(lanes))).toarray()
+    return list(skus), W
+
+def sku_cooccurrence(lines, skus):
+    # C[s, t]: orders holding both SKUs, from (OrderID, SKU) lines; SKUs not in `skus` are left out
+    pairs = lines[['OrderID', 'SKU']].drop_duplicates()
+    s = pd.Index(skus).get_indexer(pairs['SKU'])
+    o = pd.factorize(pairs['OrderID'][s >= 0])[0]
+    B = sp.csr_matrix((np.ones(len(o)), (o, s[s >= 0])), shape=(o.max() + 1 if len(o) else 0, len(skus)))
+    C = (B.T @ B).tocsr()
+    C.setdiag(0)
+    C.eliminate_zeros()
+    return C
+
+def sku_clusters(orders_df, skus, partition):
+    # each SKU joins the order cluster that takes most of its quantity (lowest cluster on ties); -1 without one
+    cid = orders_df['OrderID'].map(partition)
+    df = pd.DataFrame({'SKU': orders_df['SKU'], 'cid': cid, 'q': orders_df['Quantity']}).dropna(subset=['cid'])
+    if df.empty:
+        return np.full(len(skus), -1, dtype=np.int64)
+    q = df.groupby(['SKU', 'cid'])['q'].sum().reset_index().sort_values(['SKU', 'q', 'cid'],
+                                                                         ascending=[True, False, True])
+    best = q.drop_duplicates('SKU').set_index('SKU')['cid']
+    codes = pd.factorize(best.reindex(skus), sort=True)[0]
+    return codes.astype(np.int64)
+
+def _greedy(cost, demand, groups, C, capacity):
+    S, K = cost.shape
+    room = np.full(K, capacity, dtype=np.int64)
+    slot = np.full(S, -1, dtype=np.int64)
+    labels = np.unique(groups)
+    load = {g: demand[groups == g].sum() for g in labels.tolist()}
+    for g in sorted(load, key=lambda g: (-load[g], g)):
+        members = np.flatnonzero(groups == g)
+        Cg = C[members][:, members].tocsr()
+        # Prim-like order: heaviest SKU first, then the one tied closest (co-occurrence, then demand) to those placed
+        score = np.zeros(len(members))
+        left = np.ones(len(members), dtype=bool)
+        for _ in range(len(members)):
+            key = np.where(left, score, -np.inf)
+            cand = np.flatnonzero(key == key.max())
+            i = cand[np.argmax(demand[members[cand]])]
+            left[i] = False
+            s = members[i]
+            c = np.where(room > 0, cost[s], np.inf)
+            slot[s] = k = int(np.argmin(c))
+            room[k] -= 1
+            row = Cg.getrow(i)
+            score[row.indices] += row.data
+    return slot, room
+
+def _two_opt(cost, slot, room, max_moves, tol=1e-9):
+    # gain[a, b]: best saving of taking one SKU out of slot a into slot b; an exchange a<->b saves
+    # gain[a, b] + gain[b, a], a move into free room gain[a, b]
+    S, K = cost.shape
+    cur = cost[np.arange(S), slot]
+    members = [list(np.flatnonzero(slot == k)) for k in range(K)]
+
+    def row(k):
+        if not members[k]:
+            return np.full(K, -np.inf), np.zeros(K, dtype=np.int64)
+        m = np.asarray(members[k])
+        g = cur[m, None] - cost[m]
+        arg = np.argmax(g, axis=0)
+        return g[arg, np.arange(K)], m[arg]
+
+    gain, who = np.empty((K, K)), np.empty((K, K), dtype=np.int64)
+    for k in range(K):
+        gain[k], who[k] = row(k)
+    moves = 0
+    while moves < max_moves:
+        swap = gain + gain.T
+        np.fill_diagonal(swap, -np.inf)
+        move = np.where(room[None, :] > 0, gain, -np.inf)
+        np.fill_diagonal(move, -np.inf)
+        a, b = np.unravel_index(np.argmax(swap), swap.shape)
+        ma, mb = np.unravel_index(np.argmax(move), move.shape)
+        if max(swap[a, b], move[ma, mb]) <= tol:
+            break
+        if move[ma, mb] >= swap[a, b]:
+            s = who[ma, mb]
+            members[ma].remove(s); members[mb].append(s)
+            slot[s] = mb; cur[s] = cost[s, mb]
+            room[ma] += 1; room[mb] -= 1
+            touched = (ma, mb)
+        else:
+            s, t = who[a, b], who[b, a]
+            members[a].remove(s); members[b].remove(t)
+            members[a].append(t); members[b].append(s)
+            slot[s], slot[t] = b, a
+            cur[s], cur[t] = cost[s, b], cost[t, a]
+            touched = (a, b)
+        for k in touched:
+            gain[k], who[k] = row(k)
+        moves += 1
+    return slot, moves
+
+def place_skus(orders_df, layout, partition=None, lines=None, n_slots=TRAY_SLOTS, spacing=1.0, capacity=None,
+               cluster_weight=0.1, max_moves=None):
+    # orders_df: OrderID, SKU, Quantity, Lane[, LaneSpeed]; layout: dlssp_lanes.LaneLayout; partition: order ->
+    # cluster (e.g. dlssp_pipeline's part_final); lines: (OrderID, SKU) pairs for co-occurrence, default the
+    # orders' own; capacity: SKUs per slot, default an even share
+    skus, W = sku_lane_demand(orders_df, layout.ids)
+    S = len(skus)
+    if S == 0:
+        return TrayPlacement([], np.zeros(0, dtype=np.int64), {}, 0.0, 0.0, 0)
+    capacity = int(capacity or math.ceil(S / n_slots))
+    if capacity * n_slots < S:
+        raise ValueError(f"{S} SKUs do not fit {n_slots} slots of capacity {capacity}.")
+    D = slot_distances(layout.pos, n_slots, spacing)
+    travel = W @ D
+    demand = W.sum(axis=1)
+    groups = sku_clusters(orders_df, skus, partition) if partition is not None else np.zeros(S, dtype=np.int64)
+    cost = travel
+    if partition is not None and cluster_weight:
+        # a cluster's anchor is the slot that would serve all its SKUs best
+        pos = np.arange(n_slots) * spacing
+        anchor = {g: int(np.argmin(travel[groups == g].sum(axis=0))) for g in np.unique(groups[groups >= 0]).tolist()}
+        pull = np.zeros_like(travel)
+        for g, k in anchor.items():
+            pull[groups == g] = np.abs(pos - pos[k])
+        cost = travel + cluster_weight * demand[:, None] * pull
+    C = sku_cooccurrence(orders_df if lines is None else lines, skus)
+    slot, room = _greedy(cost, demand, groups, C, capacity)
+    initial = float(travel[np.arange(S), slot].sum())
+    slot, moves = _two_opt(cost, slot, room, 10 * S if max_moves is None else max_moves)
+    positions = dict(zip(skus, (slot * spacing).tolist()))
+    return TrayPlacement(skus, slot, positions, float(travel[np.arange(S), slot].sum()), initial, moves)
+
+def hashed_cost(orders_df, layout, n_slots=TRAY_SLOTS, spacing=1.0):
+    # expected travel of the hash layout, for comparison with TrayPlacement.cost
+    skus, W = sku_lane_demand(orders_df, layout.ids)
+    slot = np.array([hashed_slot(s, n_slots) for s in skus], dtype=np.int64)
+    return float((W @ slot_distances(layout.pos, n_slots, spacing))[np.arange(len(skus)), slot].sum())
@@ -1,5 +1,5 @@
 from dlssp_pipeline import run_dlssp_example, run_pipeline_from_excel
-import pandas as pd
+from dlssp_export import export_clustering
 
 USE_EXAMPLE = False
 EXCEL_PATH = r"C:\Users\Admin\Downloads\lssp_louvain_sample.xlsx"
@@ -13,32 +13,10 @@ else:
 
 out_path = EXCEL_PATH.replace(".xlsx", "_result.xlsx") if not USE_EXAMPLE else "dlssp_example_result.xlsx"
 
-def _part_to_df(part: dict, label="cid"):
-    return pd.DataFrame({"order": list(part.keys()), label: list(part.values())}).sort_values(["order"])
-
-def _groups_to_df(groups: dict):
-    rows = []
-    for cid, members in groups.items():
-        for o in members:
-            rows.append({"cid": cid, "order": o})
-    return pd.DataFrame(rows).sort_values(["cid", "order"])
-
-with pd.ExcelWriter(out_path, engine="xlsxwriter") as w:
-    M = result["G"].nodes()
-    _part_to_df(result["p1_part"], "cid_p1").to_excel(w, sheet_name="Partition_P1", index=False)
-    _part_to_df(result["p2_part"], "cid_p2").to_excel(w, sheet_name="Partition_P2", index=False)
-    _part_to_df(result["part_final"], "cid_final").to_excel(w, sheet_name="Partition_Final", index=False)
-    _groups_to_df(result["groups_final"]).to_excel(w, sheet_name="Groups_Final", index=False)
-    df_cinfo = pd.DataFrame([
-        {
-            "cluster_id": cid,
-            "size": len(ci["members"]),
-            "load": ci["load"],
-            "center": ci["center"],
-            "express_ratio": ci["express_ratio"],
-            "members": ", ".join(ci["members"])
-        } for cid, ci in result["cluster_info"].items()
-    ]).sort_values("cluster_id")
-    df_cinfo.to_excel(w, sheet_name="Cluster_Info", index=False)
+# full tables as Parquet (CSV without pyarrow) next to the workbook; the workbook itself is a capped summary
+paths = export_clustering(result, out_path[:-len(".xlsx")], excel=out_path)
 
 print(f"\n✓ DONE. Results saved to: {out_path}")
+for name, path in paths.items():
+    if name != "excel":
+        print(f"  {name}: {path}")
@@ -1,12 +1,25 @@
 import pandas as pd
 from datetime import datetime, timedelta
 import math
+import numpy as np
+from dlssp_export import export_schedule, to_records
+from dlssp_io import read_table
+from dlssp_orders import OrderStore
+from dlssp_sim import simulate
+from dlssp_trays import sku_hash
+import dlssp_trace as trace
+from dlssp_schedule import decode_chains, prev_wave_min, to_timedelta64, to_us, NO_CAP, US_PER_MIN
 
 Umax = 0.85
 beta = 0.5
 gamma = 1.0
 delta = 1.0
 theta = 0.9
+K = 8
+PRINT_ROWS = 50
+
+ORDER_SCHEMA = {'OrderID': 'label', 'Wave': 'number', 'ReleaseTime': 'number', 'SKU': 'label', 'Quantity': 'number',
+                'ProcessingTime': 'number', 'PackingTime': 'number', 'Lane': 'label', 'LaneSpeed': 'number'}
 
 def compute_travel_time(quantity, lane_speed, distance_factor=1.0):
     return timedelta(minutes=quantity * distance_factor / lane_speed * 10)
@@ -15,77 +28,68 @@ def compute_completion_time(start, travel, processing, packing, induction):
     return start + travel + timedelta(minutes=processing) + timedelta(minutes=packing) + induction
 
 def compute_induction_time(sku):
-    return timedelta(minutes=1 + (hash(sku) % 3))
+    return timedelta(minutes=1 + (sku_hash(sku) % 3))
 
-def decode(orders_df):
-    results = []
-    lane_last_end = {}
-    lane_total_time = {}
+def decode(orders_df, columnar=False):
+    if isinstance(orders_df, OrderStore):
+        orders_df = orders_df.to_frame()
     current_time = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
-    orders_sorted = orders_df.sort_values(by='ReleaseTime')
-    active_trays = 0
-    for _, row in orders_sorted.iterrows():
-        lane = row['Lane']
-        release = current_time + timedelta(minutes=row['ReleaseTime'])
-        lane_speed = row['LaneSpeed']
-        processing_time = row.get('ProcessingTime', 5)
-        packing_time = row['PackingTime']
-        quantity = row['Quantity']
-        sku = row['SKU']
-        last_end = lane_last_end.get(lane, release)
-        start_time = max(last_end, release)
-        if 'Wave' in row:
-            wave = row['Wave']
-            prev_wave_min = orders_sorted[orders_sorted['Wave']==wave-1]['ReleaseTime'].min() if wave>1 else release
-            start_time = min(start_time, current_time + timedelta(minutes=prev_wave_min)*theta)
-        travel_time = compute_travel_time(quantity, lane_speed)
-        induction_time = compute_induction_time(sku)
-        completion_time = compute_completion_time(start_time, travel_time, processing_time, packing_time, induction_time)
-        lane_last_end[lane] = completion_time
-        lane_total_time[lane] = lane_total_time.get(lane, timedelta(0)) + (completion_time - start_time)
-        sla_time = release + timedelta(hours=2)
-        tardiness = max(timedelta(0), completion_time - sla_time)
-        active_trays += 1
-        if active_trays / len(orders_sorted) > Umax:
-            print(f"Warning: potential gridlock at Order {row['OrderID']} (Ut>{Umax})")
-        results.append({
-            'OrderID': row['OrderID'],
-            'Wave': row['Wave'],
-            'Lane': lane,
-            'StartTime': start_time,
-            'CompletionTime': completion_time,
-            'TravelTime': travel_time,
-            'InductionTime': induction_time,
-            'SLA': sla_time,
-            'Tardiness': tardiness
-        })
-    lane_avg_time = sum(lane_total_time.values(), timedelta(0)) / len(lane_total_time)
-    for r in results:
-        lane_time = lane_total_time[r['Lane']]
-        r['LaneImbalance'] = beta * abs(lane_time - lane_avg_time)
-    return results
+    df = orders_df.sort_values(by='ReleaseTime', kind='stable').reset_index(drop=True)
+    processing = df['ProcessingTime'] if 'ProcessingTime' in df else pd.Series(5, index=df.index)
+    travel = to_us(df['Quantity'] * 1.0 / df['LaneSpeed'] * 10)
+    one_us = timedelta(microseconds=1)
+    induction = df['SKU'].map({sku: compute_induction_time(sku) // one_us for sku in df['SKU'].unique()})
+    induction = induction.to_numpy(dtype=np.int64)
+    duration = travel + to_us(processing) + to_us(df['PackingTime']) + induction
+    release = to_us(df['ReleaseTime'])
+    prev = prev_wave_min(df['Wave'].to_numpy(), df['ReleaseTime'].to_numpy())
+    cap = np.where(np.isnan(prev), NO_CAP, np.rint(to_us(np.nan_to_num(prev)) * theta).astype(np.int64))
+    lane = df['Lane'].to_numpy()
+    start, completion = decode_chains(lane, release, duration, cap)
+    sla = release + 120 * US_PER_MIN
+    tardiness = np.maximum(completion - sla, 0)
+    oids = df['OrderID'].tolist()
+    sim = simulate(lane, start, induction, travel, duration - induction - travel, K, Umax)
+    for t_from, t_to, i in sim.gridlock:
+        trace.warn("gridlock", f"potential gridlock at Order {oids[i]} (Ut>{Umax}) "
+                   f"from {t_from / US_PER_MIN:.1f} to {t_to / US_PER_MIN:.1f} min", order=oids[i],
+                   t_from=t_from, t_to=t_to)
+    trace.flush_warnings()
+    lane_total = {l: timedelta(microseconds=int(us)) for l, us in pd.Series(duration).groupby(lane).sum().items()}
+    lane_avg_time = sum(lane_total.values(), timedelta(0)) / len(lane_total) if lane_total else timedelta(0)
+    imbalance = {l: beta * abs(t - lane_avg_time) for l, t in lane_total.items()}
+    lanes, at = np.unique(lane, return_inverse=True)
+    origin = np.datetime64(current_time, 'us')
+    cols = {
+        'OrderID': df['OrderID'].to_numpy(), 'Wave': df['Wave'].to_numpy(), 'Lane': lane,
+        'StartTime': origin + to_timedelta64(start), 'CompletionTime': origin + to_timedelta64(completion),
+        'TravelTime': to_timedelta64(travel), 'InductionTime': to_timedelta64(induction),
+        'SLA': origin + to_timedelta64(sla), 'Tardiness': to_timedelta64(tardiness),
+        'LaneImbalance': np.array([imbalance[l] for l in lanes.tolist()], dtype='timedelta64[us]')[at.ravel()],
+    }
+    return cols if columnar else to_records(cols)
 
-def run_pipeline_from_excel(file_path="orders.xlsx"):
-    df = pd.read_excel(file_path)
-    results = decode(df)
+def run_pipeline_from_excel(file_path="orders.xlsx", columnar=False):
+    with trace.phase("load"):
+        df = read_table(file_path, ORDER_SCHEMA, optional=('ProcessingTime',))
+    with trace.phase("decode"):
+        results = decode(df, columnar)
     return results
 
 if __name__ == "__main__":
     input_file = "orders.xlsx"
     print(f"Reading orders from {input_file} ...")
     try:
-        results = run_pipeline_from_excel(input_file)
+        results = run_pipeline_from_excel(input_file, columnar=True)
         print("=== DLSSP Simulation Results ===")
-        for r in results:
+        for r in to_records({k: v[:PRINT_ROWS] for k, v in results.items()}):
             print(
                 f"Order {r['OrderID']} | Wave {r['Wave']} | Lane {r['Lane']} | "
                 f"Start {r['StartTime']} | Completion {r['CompletionTime']} | "
                 f"Travel {r['TravelTime']} | Induction {r['InductionTime']} | "
                 f"Tardiness {r['Tardiness']} | LaneImbalance {r['LaneImbalance']}"
             )
-        df_results = pd.DataFrame(results)
-        output_file = "results_full.xlsx"
-        df_results.to_excel(output_file, index=False)
-        print(f"\nResults saved to {output_file}")
+        paths = export_schedule(results, "results_full", excel="results_full.xlsx")
+        print(f"\nResults saved to {paths['Schedule']} (summary: {paths['excel']})")
     except FileNotFoundError:
         print(f"ERROR: File '{input_file}' not found. Please create orders.xlsx first.")
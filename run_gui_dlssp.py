@@ -1,23 +1,27 @@
 import tkinter as tk
-from tkinter import filedialog, scrolledtext, messagebox
-import threading
-import sys
+from tkinter import filedialog, scrolledtext, messagebox, ttk
 import os
 
 # Import các hàm DLSSP
 try:
-    from dlssp_pipeline import run_pipeline_from_excel
+    from dlssp_jobs import CANCELLED, DONE, FAILED, JOB_TARGETS, JobRunner
 except ImportError as e:
-    messagebox.showerror("Import Error", f"Cannot import dlssp_pipeline:\n{e}")
+    messagebox.showerror("Import Error", f"Cannot import dlssp_jobs:\n{e}")
     raise
 
+POLL_MS = 100
+MAX_LOG_CHARS = 500_000   # older log text is trimmed so the widget stays fast on long runs
+
 class DLSSPGUI:
+    # Runs go through dlssp_jobs.JobRunner (a child process per job); the Tk main loop polls its event queue
+    # every POLL_MS and is the only code that touches widgets.
     def __init__(self, master):
         self.master = master
         master.title("DLSSP - Loop Sorter Scheduling")
+        self.runner = JobRunner()
 
         # File selection
-        self.label = tk.Label(master, text="Select input Excel file:")
+        self.label = tk.Label(master, text="Select input Excel file(s):")
         self.label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
 
         self.file_path_var = tk.StringVar()
@@ -27,48 +31,111 @@ class DLSSPGUI:
         self.browse_button = tk.Button(master, text="Browse", command=self.browse_file)
         self.browse_button.grid(row=0, column=2, padx=5, pady=5)
 
-        # Run button
-        self.run_button = tk.Button(master, text="Run DLSSP", command=self.run_dlssp_thread)
-        self.run_button.grid(row=1, column=1, padx=5, pady=5)
+        # Pipeline choice, run / cancel
+        self.target_var = tk.StringVar(value="louvain")
+        self.target_box = ttk.Combobox(master, textvariable=self.target_var, values=list(JOB_TARGETS),
+                                       state="readonly", width=12)
+        self.target_box.grid(row=1, column=0, padx=5, pady=5, sticky="w")
+
+        buttons = tk.Frame(master)
+        buttons.grid(row=1, column=1, padx=5, pady=5)
+        self.run_button = tk.Button(buttons, text="Run DLSSP", command=self.run_dlssp)
+        self.run_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(buttons, text="Cancel", command=self.cancel_job)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_all_button = tk.Button(buttons, text="Cancel all", command=self.runner.cancel_all)
+        self.cancel_all_button.pack(side=tk.LEFT, padx=5)
+
+        # Job list and progress
+        self.jobs_list = tk.Listbox(master, width=100, height=6)
+        self.jobs_list.grid(row=2, column=0, columnspan=3, padx=5, pady=5)
+        self.status_var = tk.StringVar(value="Idle")
+        self.status = tk.Label(master, textvariable=self.status_var, anchor="w")
+        self.status.grid(row=3, column=0, columnspan=3, padx=5, sticky="we")
 
         # Log display
         self.log_area = scrolledtext.ScrolledText(master, width=100, height=30)
-        self.log_area.grid(row=2, column=0, columnspan=3, padx=5, pady=5)
+        self.log_area.grid(row=4, column=0, columnspan=3, padx=5, pady=5)
+        self.log_chars = 0
+        self.job_states = ()
 
-        # Redirect stdout/stderr
-        sys.stdout = self
-        sys.stderr = self
+        master.protocol("WM_DELETE_WINDOW", self.close)
+        master.after(POLL_MS, self.poll)
 
     def browse_file(self):
-        filename = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
-        if filename:
-            self.file_path_var.set(filename)
+        filenames = filedialog.askopenfilenames(filetypes=[("Input files", "*.xlsx *.xls *.csv *.parquet *.arrow")])
+        if filenames:
+            self.file_path_var.set(";".join(filenames))
 
-    def write(self, msg):
+    def log(self, msg):
         self.log_area.insert(tk.END, msg)
+        self.log_chars += len(msg)
+        if self.log_chars > MAX_LOG_CHARS:
+            self.log_area.delete("1.0", f"1.0 + {self.log_chars - MAX_LOG_CHARS} chars")
+            self.log_chars = MAX_LOG_CHARS
         self.log_area.see(tk.END)
 
-    def flush(self):
-        pass
+    def run_dlssp(self):
+        paths = [p for p in self.file_path_var.get().split(";") if p]
+        bad = [p for p in paths if not os.path.isfile(p)]
+        if not paths or bad:
+            messagebox.showwarning("Warning", "Please select valid input file(s)!")
+            return
+        for job in self.runner.submit_batch(paths, self.target_var.get()):
+            self.log(f"Queued job {job.id}: {job.path}\n")
+        self.refresh_jobs()
 
-    def run_dlssp_thread(self):
-        # Run DLSSP in a separate thread to keep GUI responsive
-        t = threading.Thread(target=self.run_dlssp)
-        t.start()
+    def cancel_job(self):
+        sel = self.jobs_list.curselection()
+        job_id = list(self.runner.jobs)[sel[0]] if sel else None
+        if self.runner.cancel(job_id):
+            self.log("Cancelling...\n")
+        self.refresh_jobs()
 
-    def run_dlssp(self):
-        filepath = self.file_path_var.get()
-        if not filepath or not os.path.isfile(filepath):
-            messagebox.showwarning("Warning", "Please select a valid Excel file!")
+    def refresh_jobs(self):
+        self.job_states = tuple(job.state for job in self.runner.jobs.values())
+        self.jobs_list.delete(0, tk.END)
+        for job in self.runner.jobs.values():
+            self.jobs_list.insert(tk.END, f"#{job.id} [{job.state}] {job.target}: {job.path}"
+                                          + (f" -> {job.out}" if job.out else ""))
+
+    def describe(self, job):
+        parts = [f"Job {job.id} {job.state}"]
+        if job.phase:
+            parts.append(f"phase {job.phase}")
+        alns = job.progress.get("alns")
+        if alns:
+            parts.append(f"ALNS {alns['iteration']}/{alns['iters']} best {alns['best']:.2f}")
+        for kind in ("louvain", "refine", "online"):
+            p = job.progress.get(kind)
+            if p:
+                parts.append(f"{kind} " + " ".join(f"{k}={v}" for k, v in p.items()))
+        return " | ".join(parts)
+
+    def poll(self):
+        events = self.runner.poll()
+        for job, kind, payload in events:
+            if kind == "log":
+                self.log(payload)
+            elif kind == DONE:
+                self.log(f"\n Done! Job {job.id}" + (f" results saved to: {job.out}\n" if job.out else "\n"))
+            elif kind == FAILED:
+                self.log(f"\n Job {job.id} failed: {job.error}\n")
+            elif kind == CANCELLED:
+                self.log(f"\n Job {job.id} cancelled\n")
+            if kind != "log":
+                self.status_var.set(self.describe(job))
+        if tuple(job.state for job in self.runner.jobs.values()) != self.job_states:
+            self.refresh_jobs()
+        if not self.runner.busy() and events:
+            self.status_var.set("Idle")
+        self.master.after(POLL_MS, self.poll)
+
+    def close(self):
+        if self.runner.busy() and not messagebox.askyesno("Quit", "Jobs are still running. Cancel them and quit?"):
             return
-        try:
-            print(f"Running DLSSP pipeline on: {filepath}")
-            out_path = run_pipeline_from_excel(filepath)
-            print(f"\n Done! Results saved to: {out_path}")
-            messagebox.showinfo("Success", f"DLSSP completed!\nOutput saved to:\n{out_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"DLSSP failed:\n{e}")
-            raise
+        self.runner.shutdown()
+        self.master.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()